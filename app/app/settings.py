@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.QueryAttributionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +91,57 @@ DATABASES = {
     }
 }
 
+# Read-only analytics queries go to a replica when one is configured
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ.get('DB_REPLICA_HOST'),
+        TEST={'MIRROR': 'default'},
+    )
+
+SCORE_ANALYTICS_DATABASE = 'replica' if 'replica' in DATABASES \
+    else 'default'
+
+# How long score simulations reuse the rollup means, see score.simulation
+SCORE_SIMULATION_CACHE_SECONDS = 300
+
+# Batch score lookups, see score.batch
+SCORE_BATCH_MAX_USERS = 10000
+SCORE_BATCH_CHUNK_SIZE = 1000
+
+# Recommended products are those of the catalog account, ranked by the
+# user's weakest sub-scores their tags address, see product.recommendations
+RECOMMENDATION_CATALOG_USER = os.environ.get('RECOMMENDATION_CATALOG_USER')
+RECOMMENDATION_TAGS = {
+    'score_medical': ('medical', 'health'),
+    'score_income': ('income', 'savings'),
+    'score_stuff': ('stuff', 'property'),
+    'score_liability': ('liability',),
+    'score_digital': ('digital', 'cyber'),
+}
+RECOMMENDATION_INDEX_MAX_AGE = 300
+
+
+# Caches
+# Throttling relies on atomic counters shared by every worker, so production
+# points the default cache at memcached.
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ.get('MEMCACHED_LOCATION'),
+        }
+    }
+
+
+# Zipcode reference data, built with the build_zipcode_table command
+ZIPCODE_TABLE_PATH = os.environ.get(
+    'ZIPCODE_TABLE_PATH', os.path.join(BASE_DIR, 'data', 'zipcodes.bin')
+)
+# How often workers check whether the file was rebuilt, in seconds
+ZIPCODE_TABLE_CHECK_INTERVAL = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -128,4 +181,73 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'login_ip': '60/min',
+        'signup': '20/hour',
+        'product_write': '120/min',
+    },
+}
+
+
+# Responses smaller than this are not worth compressing
+COMPRESSION_MIN_SIZE = 1024
+
+
+# Background jobs, see core.jobs
+
+JOB_QUEUES = {
+    'default': {'concurrency': 8},
+}
+
+
+# Slow query capture, see core.slow_queries. An empty or "off"
+# SLOW_QUERY_THRESHOLD sets the threshold to None, turning it off.
+
+_slow_query_threshold = os.environ.get('SLOW_QUERY_THRESHOLD', '250').strip()
+SLOW_QUERY_THRESHOLD = (
+    None if _slow_query_threshold.lower() in ('', 'off')
+    else float(_slow_query_threshold)
+)
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', 1.0))
+SLOW_QUERY_MAX_PER_MINUTE = 30
+
+
+# Server-side prepared statements for repeated queries, see core.prepared.
+# Keep off behind a transaction pooling connection pooler.  Generic plans
+# are forced since PostgreSQL keeps replanning queries on the partitioned
+# product and tag tables otherwise, which is the cost this saves.
+
+PREPARED_STATEMENTS = os.environ.get('PREPARED_STATEMENTS') == '1'
+PREPARED_STATEMENT_THRESHOLD = 5
+PREPARED_STATEMENT_CACHE_SIZE = 100
+
+if PREPARED_STATEMENTS:
+    for database in DATABASES.values():
+        options = database.setdefault('OPTIONS', {})
+        options['options'] = ' '.join(filter(None, [
+            options.get('options'), '-c plan_cache_mode=force_generic_plan'
+        ]))
+
+
+# Where relay_outbox delivers change events, see core.outbox
+
+OUTBOX_SINK = os.environ.get('OUTBOX_SINK')
+
+
+# How long responses are kept for replay to a repeated Idempotency-Key, see
+# core.idempotency
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
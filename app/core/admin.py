@@ -40,3 +40,5 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Product)
+admin.site.register(models.Job)
+admin.site.register(models.AccountDeletion)
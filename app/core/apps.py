@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa
+        from core import prepared, slow_queries
+
+        connection_created.connect(slow_queries.install,
+                                   dispatch_uid='core.slow_queries')
+        connection_created.connect(prepared.install,
+                                   dispatch_uid='core.prepared')
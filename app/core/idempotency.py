@@ -0,0 +1,119 @@
+"""Idempotency-Key support for create endpoints.
+
+A client retrying a POST sends the same Idempotency-Key header.  The first
+response to a key is stored for IDEMPOTENCY_KEY_TTL seconds, scoped to the
+user, or to the client address for anonymous requests, and to the path.
+Retries get it replayed byte for byte, marked with Idempotent-Replayed,
+instead of creating the object again.  A retry arriving while the first
+request still runs waits for it behind a cache lock, then replays its
+response or answers 409.  Reusing a key with a different body is a 422.
+Server errors are not stored, so they can be retried.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, RawPostDataException
+from django.utils.encoding import force_bytes
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotentCreateMixin:
+    """View mixin replaying the stored response of a repeated create"""
+    idempotency_lock_timeout = 30
+    idempotency_lock_wait = 5
+    idempotency_poll_interval = 0.05
+
+    def idempotency_scope(self, request):
+        """Return who a key belongs to"""
+        if request.user and request.user.is_authenticated:
+            return 'user-%s' % request.user.pk
+        return 'ip-%s' % BaseThrottle().get_ident(request)
+
+    def request_digest(self, request):
+        """Return a digest of the request body"""
+        try:
+            body = request.body
+        except RawPostDataException:
+            body = force_bytes(repr(sorted(request.data.items())))
+        return hashlib.md5(body).hexdigest()
+
+    def replay(self, stored):
+        response = HttpResponse(stored['content'], status=stored['status'])
+        for header, value in stored['headers']:
+            response[header] = value
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def wait_for_response(self, key):
+        """Return the response stored under a key, waiting for the lock"""
+        deadline = time.monotonic() + self.idempotency_lock_wait
+        while True:
+            stored = cache.get(key)
+            if stored is not None or time.monotonic() >= deadline:
+                return stored
+            time.sleep(self.idempotency_poll_interval)
+
+    def create(self, request, *args, **kwargs):
+        self.idempotency = None
+        idempotency_key = request.META.get(HEADER)
+        if not idempotency_key:
+            return super().create(request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': 'Idempotency-Key is longer than %d characters.'
+                 % MAX_KEY_LENGTH},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        key = 'idempotency:%s' % hashlib.md5(force_bytes('%s:%s:%s' % (
+            self.idempotency_scope(request), request.path, idempotency_key
+        ))).hexdigest()
+        digest = self.request_digest(request)
+        stored = cache.get(key)
+        if stored is None and not cache.add(key + ':lock', 1,
+                                            self.idempotency_lock_timeout):
+            stored = self.wait_for_response(key)
+            if stored is None:
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key is in '
+                     'progress.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+        if stored is not None:
+            if stored['digest'] != digest:
+                return Response(
+                    {'detail': 'Idempotency-Key was used with a different '
+                     'request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return self.replay(stored)
+
+        self.idempotency = (key, digest)
+        return super().create(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args,
+                                             **kwargs)
+        if getattr(self, 'idempotency', None) is None:
+            return response
+        key, digest = self.idempotency
+        self.idempotency = None
+        if response.status_code < 500:
+            response.render()
+            cache.set(key, {
+                'digest': digest,
+                'status': response.status_code,
+                'headers': list(response.items()),
+                'content': response.content,
+            }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+        cache.delete(key + ':lock')
+        return response
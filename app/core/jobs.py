@@ -0,0 +1,183 @@
+"""Database backed job queue.
+
+Jobs are rows of core.Job.  Workers claim batches with SELECT ... FOR
+UPDATE SKIP LOCKED, so any number of them can poll the same queue without
+blocking each other, and the claim commits before the jobs run.  A job is
+the dotted path of a function called with its JSON payload as keyword
+arguments.  A claimed job is locked again right before it runs, and its
+outcome is only recorded while the worker still holds it, so a job
+requeued by release_stale after waiting in a slow batch is never run or
+updated twice.  Failed jobs are retried with exponential backoff until they run
+out of attempts.
+
+Per-queue limits on the number of running jobs come from JOB_QUEUES:
+
+    JOB_QUEUES = {'default': {'concurrency': 4}}
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def task_path(task):
+    """Return the dotted path of a task given as a function or a string"""
+    if callable(task):
+        return '%s.%s' % (task.__module__, task.__qualname__)
+    return task
+
+
+def enqueue(task, queue='default', run_at=None, max_attempts=5, **payload):
+    """Add a job running task(**payload) to a queue and return it"""
+    return Job.objects.create(
+        queue=queue,
+        task=task_path(task),
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts
+    )
+
+
+def backoff(attempts):
+    """Return the delay before retrying a job that failed attempts times"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def concurrency(queue):
+    """Return the maximum number of running jobs of a queue, or None"""
+    queues = getattr(settings, 'JOB_QUEUES', {})
+    return queues.get(queue, {}).get('concurrency')
+
+
+def release_stale(queue):
+    """Requeue running jobs whose worker stopped reporting back"""
+    return Job.objects.filter(
+        queue=queue, status=Job.RUNNING,
+        locked_at__lt=timezone.now() - LOCK_TIMEOUT
+    ).update(status=Job.QUEUED, locked_at=None, locked_by='')
+
+
+def claim(queue, worker, limit):
+    """Claim up to limit due jobs of a queue for a worker and return them"""
+    with transaction.atomic():
+        maximum = concurrency(queue)
+        if maximum is not None:
+            # Serialize claims on this queue so the limit holds across workers
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                               ['core.jobs:%s' % queue])
+            running = Job.objects.filter(queue=queue,
+                                         status=Job.RUNNING).count()
+            limit = min(limit, maximum - running)
+        if limit <= 0:
+            return []
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(queue=queue, status=Job.QUEUED,
+                    run_at__lte=timezone.now())
+            .order_by('run_at', 'id')[:limit]
+        )
+        now = timezone.now()
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, locked_at=now,
+            locked_by=worker
+        )
+        for job in jobs:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_at = now
+            job.locked_by = worker
+    return jobs
+
+
+def held(job):
+    """Return a queryset of the job as long as its claim was not lost"""
+    return Job.objects.filter(id=job.id, status=Job.RUNNING,
+                              locked_by=job.locked_by, attempts=job.attempts)
+
+
+def start(job):
+    """Renew the lock of a claimed job, returning False if it was lost"""
+    job.locked_at = timezone.now()
+    return bool(held(job).update(locked_at=job.locked_at))
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s (%s) failed on attempt %d', job.id, job.task,
+                       job.attempts)
+        if job.attempts >= job.max_attempts:
+            held(job).update(
+                status=Job.FAILED, last_error=error, locked_at=None
+            )
+        else:
+            held(job).update(
+                status=Job.QUEUED, last_error=error, locked_at=None,
+                locked_by='', run_at=timezone.now() + backoff(job.attempts)
+            )
+        return False
+    held(job).update(status=Job.DONE, locked_at=None)
+    return True
+
+
+class Worker:
+    """Polls queues and runs their jobs in the thread calling run()"""
+
+    def __init__(self, queues=('default',), batch_size=10, poll_interval=1,
+                 name='worker'):
+        self.queues = list(queues)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.name = '%s:%d:%s' % (socket.gethostname(), os.getpid(), name)
+        self.stopping = threading.Event()
+
+    def run_once(self):
+        """Claim and run one batch from each queue, return jobs run"""
+        count = 0
+        for queue in self.queues:
+            release_stale(queue)
+            for job in claim(queue, self.name, self.batch_size):
+                if not start(job):
+                    logger.warning('Job %s was released before it ran',
+                                   job.id)
+                    continue
+                run_job(job)
+                count += 1
+        return count
+
+    def run(self, burst=False):
+        """Process jobs until stopped, or until idle when burst is set"""
+        try:
+            while not self.stopping.is_set():
+                if not self.run_once():
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopping.set()
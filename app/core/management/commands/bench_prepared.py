@@ -0,0 +1,126 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from core.models import Product, Tag
+from core.prepared import execute_sql, server_sql
+from core.slow_queries import fingerprint
+
+from product.views import ProductViewSet, TagViewSet
+from user.views import ManageUserView
+
+
+VIEWS = (
+    ('products', ProductViewSet.as_view({'get': 'list'})),
+    ('tags', TagViewSet.as_view({'get': 'list'})),
+    ('profile', ManageUserView.as_view()),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def planning_time(cursor, sql, params):
+    """Return the planning milliseconds EXPLAIN ANALYZE reports"""
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time']
+
+
+class Command(BaseCommand):
+    """Django command to benchmark prepared statements on API queries"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.benchmark(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def sample_user(self, options):
+        """Create a user with products and tags, return its token"""
+        user = get_user_model().objects.create_user('0000000000', None)
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name='Tag %d' % index)
+            for index in range(options['tags'])
+        )
+        for index in range(options['products']):
+            product = Product.objects.create(
+                user=user, title='Product %d' % index, price=index % 100
+            )
+            product.tags.add(*tags[index % len(tags):][:3])
+        return Token.objects.create(user=user).key
+
+    def benchmark(self, options):
+        token = self.sample_user(options)
+        factory = APIRequestFactory()
+
+        def request(view):
+            view(factory.get('/', HTTP_AUTHORIZATION='Token ' + token))
+
+        statements = {}
+
+        def collect(execute, sql, params, many, context):
+            if sql.startswith('SELECT'):
+                statements.setdefault(sql, params)
+            return execute(sql, params, many, context)
+
+        with override_settings(PREPARED_STATEMENTS=False):
+            with connection.execute_wrapper(collect):
+                for _, view in VIEWS:
+                    request(view)
+
+        self.stdout.write('Planning time per statement, ms '
+                          '(unprepared / prepared generic plan)')
+        with connection.cursor() as cursor:
+            # As configured in settings along with PREPARED_STATEMENTS
+            cursor.execute('SET LOCAL plan_cache_mode = force_generic_plan')
+            for index, (sql, params) in enumerate(statements.items()):
+                name = 'bench_%d' % index
+                cursor.execute('PREPARE %s AS %s' % (name, server_sql(sql)))
+                plain = statistics.median(
+                    planning_time(cursor, sql, params) for _ in range(5)
+                )
+                prepared = statistics.median(
+                    planning_time(cursor, execute_sql(name, params), params)
+                    for _ in range(5)
+                )
+                cursor.execute('DEALLOCATE %s' % name)
+                self.stdout.write('%8.3f %8.3f  %s' % (
+                    plain, prepared, fingerprint(sql)[0][:100]
+                ))
+
+        repeat = options['repeat']
+        self.stdout.write('\nTime per request, ms, %d requests each '
+                          '(unprepared / prepared)' % repeat)
+        for label, view in VIEWS:
+            timings = []
+            for enabled in (False, True):
+                with override_settings(PREPARED_STATEMENTS=enabled):
+                    for _ in range(10):
+                        request(view)
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        request(view)
+                    timings.append(
+                        (time.perf_counter() - start) / repeat * 1000
+                    )
+            self.stdout.write('%8.3f %8.3f  %s' % (timings[0], timings[1],
+                                                   label))
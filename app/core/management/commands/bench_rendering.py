@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils.text import compress_string
+
+from rest_framework.renderers import JSONRenderer
+
+from core import middleware
+from core.renderers import FastJSONRenderer
+
+
+def sample_products(count):
+    """Return product list data shaped like ProductSerializer output"""
+    return [
+        OrderedDict([
+            ('id', index),
+            ('title', 'Product %d' % index),
+            ('tags', [index % 7, index % 11, index % 13]),
+            ('price', str(Decimal(index % 1000) + Decimal('0.99'))),
+            ('link', 'https://example.com/products/%d' % index),
+        ])
+        for index in range(count)
+    ]
+
+
+def cpu_time(func, repeat):
+    """Return the CPU seconds per call of func"""
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) / repeat
+
+
+class Command(BaseCommand):
+    """Django command to benchmark response rendering and compression"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        data = sample_products(options['products'])
+        repeat = options['repeat']
+        self.stdout.write('%d products, %d runs each' %
+                          (options['products'], repeat))
+
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            body = renderer.render(data)
+            self.stdout.write('%-20s %9d bytes %9.3f ms' % (
+                renderer.__class__.__name__, len(body),
+                cpu_time(lambda: renderer.render(data), repeat) * 1000
+            ))
+
+        encoders = [('gzip', compress_string)]
+        if middleware.brotli is not None:
+            encoders.append(('br', lambda content: middleware.brotli.compress(
+                content, quality=middleware.BROTLI_QUALITY
+            )))
+        for name, compress in encoders:
+            self.stdout.write('%-20s %9d bytes %9.3f ms' % (
+                name, len(compress(body)),
+                cpu_time(lambda: compress(body), repeat) * 1000
+            ))
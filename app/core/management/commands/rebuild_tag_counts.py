@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Tag, Product
+
+
+class Command(BaseCommand):
+    """Django command to recompute Tag.product_count from the links table"""
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding tag product counters...')
+        links = Product.tags.through.objects.filter(
+            tag_id=OuterRef('pk')
+        ).order_by().values('tag_id').annotate(total=Count('*'))
+        with transaction.atomic():
+            updated = Tag.objects.update(product_count=Coalesce(
+                Subquery(links.values('total'), output_field=IntegerField()),
+                0
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt counters for %d tags' % updated
+        ))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    """Django command to deliver outbox events to a sink"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sink', default=settings.OUTBOX_SINK,
+                            help='file:<path>, unix:<path>, an http(s) URL '
+                                 'or the dotted path of a Sink class')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--poll-interval', type=float, default=1)
+        parser.add_argument('--report-interval', type=float, default=60,
+                            help='Seconds between throughput and lag reports')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the outbox is empty')
+        parser.add_argument('--stats', action='store_true',
+                            help='Only show the outbox lag')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            pending, age = outbox.lag()
+            self.stdout.write('%d events pending, oldest %.1fs old' % (
+                pending, age
+            ))
+            return
+        if not options['sink']:
+            raise CommandError('No sink given and OUTBOX_SINK is not set')
+        if not outbox.lock():
+            raise CommandError('Another outbox relay is running')
+
+        sink = outbox.get_sink(options['sink'])
+        try:
+            outbox.relay(sink, options['batch_size'],
+                         options['poll_interval'], options['burst'],
+                         options['report_interval'], self.stdout.write)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.close()
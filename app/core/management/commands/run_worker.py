@@ -0,0 +1,50 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    """Django command to run background job workers"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Queue to process, may be repeated')
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Number of worker threads')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--poll-interval', type=float, default=1)
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queues are empty')
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or ['default']
+        workers = []
+        threads = []
+        for number in range(options['threads']):
+            worker = Worker(queues, options['batch_size'],
+                            options['poll_interval'],
+                            name='worker-%d' % number)
+            workers.append(worker)
+            threads.append(threading.Thread(
+                target=worker.run, kwargs={'burst': options['burst']},
+                name=worker.name
+            ))
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping workers...')
+            for worker in workers:
+                worker.stop()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write('Running %d workers on %s' %
+                          (len(threads), ', '.join(queues)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core.models import SlowQuery
+
+
+ORDERINGS = {
+    'total': '-total_time',
+    'max': '-max_time',
+    'calls': '-calls',
+    'mean': (F('total_time') / F('calls')).desc(),
+    'recent': '-last_seen',
+}
+
+
+class Command(BaseCommand):
+    """Django command to show the slowest recorded query fingerprints"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=sorted(ORDERINGS),
+                            default='total',
+                            help='Order of the fingerprints shown')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Number of fingerprints shown')
+        parser.add_argument('--plans', action='store_true',
+                            help='Show the latest plan of each query')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete all recorded queries')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(
+                'Deleted %d fingerprints' % deleted
+            ))
+            return
+
+        queries = SlowQuery.objects.order_by(ORDERINGS[options['sort']])
+        for query in queries[:options['limit']]:
+            self.stdout.write(
+                '%s  calls %d  total %.0f ms  mean %.1f ms  max %.1f ms  %s'
+                % (query.fingerprint[:12], query.calls, query.total_time,
+                   query.total_time / query.calls, query.max_time,
+                   query.view or '-')
+            )
+            self.stdout.write('    %s' % query.sql)
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write('      %s' % line)
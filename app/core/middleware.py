@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from core import slow_queries
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header):
+    """Return the encodings of an Accept-Encoding header with their q"""
+    encodings = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip, as the client prefers.
+
+    Bodies shorter than COMPRESSION_MIN_SIZE are sent as is, as are
+    streaming responses to clients that don't accept gzip.  Brotli is used
+    when the brotli package is installed.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        candidates = ['gzip']
+        if brotli is not None and not response.streaming:
+            candidates.insert(0, 'br')
+        candidates = [name for name in candidates
+                      if accepted.get(name, accepted.get('*', 0)) > 0]
+        if not candidates:
+            return response
+        encoding = max(candidates, key=lambda name: accepted.get(
+            name, accepted.get('*', 0)
+        ))
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content,
+                                             quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Compressed bodies differ byte-wise, so strong ETags become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class QueryAttributionMiddleware(MiddlewareMixin):
+    """Name the view being served in slow query records"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        slow_queries.set_view('%s %s' % (
+            request.method, match.view_name if match else request.path
+        ))
+
+    def process_response(self, request, response):
+        slow_queries.set_view('')
+        return response
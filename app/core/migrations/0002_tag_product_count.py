@@ -0,0 +1,31 @@
+# Generated by Django 2.1.15 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE core_tag SET product_count = counts.total
+            FROM (SELECT tag_id, COUNT(*) AS total
+                  FROM core_product_tags GROUP BY tag_id) AS counts
+            WHERE core_tag.id = counts.tag_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-product_count'], name='core_tag_user_count_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.15 on 2026-10-19 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tag_product_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=20)),
+                ('education', models.CharField(blank=True, default='', max_length=50)),
+                ('employment', models.CharField(blank=True, default='', max_length=50)),
+                ('age_band', models.CharField(blank=True, default='', max_length=10)),
+                ('value', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='scorebucket',
+            unique_together={('metric', 'education', 'employment', 'age_band', 'value')},
+        ),
+    ]
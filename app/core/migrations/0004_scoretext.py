@@ -0,0 +1,52 @@
+# Generated by Django 2.1.15 on 2026-10-19 05:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_scorebucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreText',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=32, unique=True)),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_digital_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_income_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_liability_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_medical_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_overall_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='desc_stuff_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.ScoreText'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations, transaction
+
+
+DESCRIPTIONS = ('overall', 'medical', 'income', 'stuff', 'liability',
+                'digital')
+BATCH_SIZE = 10000
+
+
+def intern_descriptions(apps, schema_editor):
+    """Point every score at interned copies of its description texts.
+
+    Works through core_score in id ranges, each in its own transaction, so
+    millions of rows never sit in one long-running statement.  Every step
+    is idempotent and the migration can simply be re-run if interrupted.
+    """
+    texts = ' UNION '.join(
+        'SELECT desc_{0} AS text FROM core_score '
+        'WHERE id >= %(low)s AND id < %(high)s '
+        'AND desc_{0} IS NOT NULL'.format(name) for name in DESCRIPTIONS
+    )
+    intern_sql = (
+        'INSERT INTO core_scoretext (digest, text) '
+        'SELECT md5(text), text FROM ({}) AS texts '
+        'ON CONFLICT (digest) DO NOTHING'.format(texts)
+    )
+    link_sql = 'UPDATE core_score SET {} WHERE id >= %(low)s ' \
+               'AND id < %(high)s'.format(', '.join(
+                   'desc_{0}_ref_id = (SELECT id FROM core_scoretext '
+                   'WHERE digest = md5(core_score.desc_{0}))'.format(name)
+                   for name in DESCRIPTIONS
+               ))
+
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM core_score')
+        low, last = cursor.fetchone()
+    if low is None:
+        return
+    while low <= last:
+        params = {'low': low, 'high': low + BATCH_SIZE}
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute(intern_sql, params)
+            cursor.execute(link_sql, params)
+        low += BATCH_SIZE
+
+
+def restore_descriptions(apps, schema_editor):
+    """Copy interned texts back into the inline description columns"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('UPDATE core_score SET {}'.format(', '.join(
+            'desc_{0} = (SELECT text FROM core_scoretext '
+            'WHERE id = core_score.desc_{0}_ref_id)'.format(name)
+            for name in DESCRIPTIONS
+        )))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_scoretext'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_descriptions, restore_descriptions),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+DESCRIPTIONS = ('overall', 'medical', 'income', 'stuff', 'liability',
+                'digital')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_intern_score_descriptions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(model_name='score', name='desc_%s' % name)
+        for name in DESCRIPTIONS
+    ] + [
+        migrations.RenameField(model_name='score',
+                               old_name='desc_%s_ref' % name,
+                               new_name='desc_%s' % name)
+        for name in DESCRIPTIONS
+    ]
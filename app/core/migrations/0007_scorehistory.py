@@ -0,0 +1,93 @@
+# Generated by Django 2.1.15 on 2026-10-19 05:58
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+CREATE_SQL = """
+CREATE TABLE core_scorehistory (
+    id serial NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    score_id integer NOT NULL REFERENCES core_score (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    user_id integer NOT NULL REFERENCES core_user (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE core_scorehistory_default
+    PARTITION OF core_scorehistory DEFAULT;
+CREATE INDEX core_scorehist_user_idx
+    ON core_scorehistory (user_id, created_at DESC);
+CREATE INDEX core_scorehistory_score_id
+    ON core_scorehistory (score_id);
+"""
+
+PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {name} PARTITION OF core_scorehistory
+FOR VALUES FROM (%s) TO (%s)
+"""
+PARTITION_MONTHS = 3
+
+BACKFILL_SQL = """
+INSERT INTO core_scorehistory (user_id, score_id, created_at)
+SELECT id, scores_initial_id, COALESCE(date_joined, now())
+FROM core_user WHERE scores_initial_id IS NOT NULL
+UNION ALL
+SELECT id, scores_final_id, now()
+FROM core_user WHERE scores_final_id IS NOT NULL
+    AND scores_final_id IS DISTINCT FROM scores_initial_id;
+"""
+
+
+def create_partitions(apps, schema_editor):
+    """Create the partitions of the coming months before backfilling.
+
+    The backfill stamps current scores with now(), and those rows would
+    otherwise land in the default partition and keep the month's partition
+    from being created.
+    """
+    today = django.utils.timezone.now().date()
+    first = today.year * 12 + today.month - 1
+    starts = [datetime.date(month // 12, month % 12 + 1, 1)
+              for month in range(first, first + PARTITION_MONTHS + 1)]
+    with schema_editor.connection.cursor() as cursor:
+        for start, end in zip(starts, starts[1:]):
+            name = 'core_scorehistory_y%04dm%02d' % (start.year, start.month)
+            cursor.execute(PARTITION_SQL.format(name=name), [start, end])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_score_description_refs'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_SQL,
+                                  'DROP TABLE core_scorehistory'),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='ScoreHistory',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('score', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Score')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_history', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.AddIndex(
+                    model_name='scorehistory',
+                    index=models.Index(fields=['user', '-created_at'], name='core_scorehist_user_idx'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name=model_name,
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        )
+        for model_name in ('product', 'score', 'tag', 'user')
+    ] + [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'updated_at'], name='core_product_user_upd_idx'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 2.1.15 on 2026-10-19 06:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+TRIGGERS_SQL = """
+CREATE SEQUENCE core_change_seq;
+
+CREATE FUNCTION core_stamp_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_txid := txid_current();
+    NEW.change_seq := nextval('core_change_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_record_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_tombstone
+        (user_id, kind, object_id, change_txid, change_seq)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id, txid_current(),
+            nextval('core_change_seq'));
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_product_stamp_change
+    BEFORE INSERT OR UPDATE ON core_product
+    FOR EACH ROW EXECUTE PROCEDURE core_stamp_change();
+CREATE TRIGGER core_product_tombstone
+    AFTER DELETE ON core_product
+    FOR EACH ROW EXECUTE PROCEDURE core_record_tombstone('product');
+
+-- Only the name is synced, so counter updates do not resend tags
+CREATE TRIGGER core_tag_stamp_change
+    BEFORE INSERT OR UPDATE OF name, user_id ON core_tag
+    FOR EACH ROW EXECUTE PROCEDURE core_stamp_change();
+CREATE TRIGGER core_tag_tombstone
+    AFTER DELETE ON core_tag
+    FOR EACH ROW EXECUTE PROCEDURE core_record_tombstone('tag');
+
+UPDATE core_product SET change_seq = 0;
+UPDATE core_tag SET name = name;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_tag_tombstone ON core_tag;
+DROP TRIGGER core_tag_stamp_change ON core_tag;
+DROP TRIGGER core_product_tombstone ON core_product;
+DROP TRIGGER core_product_stamp_change ON core_product;
+DROP FUNCTION core_record_tombstone();
+DROP FUNCTION core_stamp_change();
+DROP SEQUENCE core_change_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('change_txid', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='change_txid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_txid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'change_txid', 'change_seq'], name='core_product_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'change_txid', 'change_seq'], name='core_tag_user_change_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_txid', 'change_seq'], name='core_tomb_user_change_idx'),
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,119 @@
+from django.db import migrations
+
+
+PARTITIONS = 16
+
+# Indexes which do not back a constraint, recreated by definition
+INDEXES_SQL = """
+SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+WHERE i.indrelid = %s::regclass AND NOT EXISTS (
+    SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid
+)
+"""
+
+# Unique and foreign key constraints, except references to partitioned
+# tables, which PostgreSQL cannot enforce since their keys are composite
+CONSTRAINTS_SQL = """
+SELECT c.conname, pg_get_constraintdef(c.oid) FROM pg_constraint c
+LEFT JOIN pg_class r ON r.oid = c.confrelid
+WHERE c.conrelid = %s::regclass AND c.contype IN ('u', 'f')
+    AND r.relkind IS DISTINCT FROM 'p'
+"""
+
+TRIGGERS_SQL = """
+SELECT pg_get_triggerdef(oid) FROM pg_trigger
+WHERE tgrelid = %s::regclass AND NOT tgisinternal
+"""
+
+THROUGH_FOREIGN_KEYS_SQL = """
+ALTER TABLE core_product_tags
+    ADD CONSTRAINT core_product_tags_product_id_fk_core_product_id
+    FOREIGN KEY (product_id) REFERENCES core_product (id)
+    DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT core_product_tags_tag_id_fk_core_tag_id
+    FOREIGN KEY (tag_id) REFERENCES core_tag (id)
+    DEFERRABLE INITIALLY DEFERRED
+"""
+
+
+def rebuild(cursor, table, key=None):
+    """Copy a table into a new one, hash partitioned on key if given.
+
+    Defaults, checks, indexes, constraints and triggers carry over.  The
+    primary key gains the partition key, as PostgreSQL requires.
+    """
+    definitions = []
+    for sql in (INDEXES_SQL, TRIGGERS_SQL):
+        cursor.execute(sql, [table])
+        definitions += [row[0] for row in cursor.fetchall()]
+    cursor.execute(CONSTRAINTS_SQL, [table])
+    definitions += ['ALTER TABLE %s ADD CONSTRAINT %s %s' % (table, *row)
+                    for row in cursor.fetchall()]
+
+    cursor.execute('ALTER TABLE {0} RENAME TO {0}_old'.format(table))
+    cursor.execute(
+        'CREATE TABLE {0} (LIKE {0}_old INCLUDING DEFAULTS '
+        'INCLUDING CONSTRAINTS){1}'.format(
+            table, ' PARTITION BY HASH (%s)' % key if key else ''
+        )
+    )
+    for remainder in range(PARTITIONS if key else 0):
+        cursor.execute(
+            'CREATE TABLE {0}_p{1} PARTITION OF {0} '
+            'FOR VALUES WITH (MODULUS {2}, REMAINDER {1})'.format(
+                table, remainder, PARTITIONS
+            )
+        )
+    cursor.execute('INSERT INTO {0} SELECT * FROM {0}_old'.format(table))
+    cursor.execute("SELECT pg_get_serial_sequence('%s_old', 'id')" % table)
+    cursor.execute('ALTER SEQUENCE %s OWNED BY %s.id' % (
+        cursor.fetchone()[0], table
+    ))
+    cursor.execute('DROP TABLE %s_old CASCADE' % table)
+    cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {0}_pkey '
+                   'PRIMARY KEY ({1})'.format(
+                       table, ', '.join(filter(None, ('id', key)))
+                   ))
+    for sql in definitions:
+        cursor.execute(sql)
+
+
+def partition(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        rebuild(cursor, 'core_product', 'user_id')
+        rebuild(cursor, 'core_tag', 'user_id')
+        rebuild(cursor, 'core_product_tags', 'product_id')
+
+
+def unpartition(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        rebuild(cursor, 'core_product_tags')
+        rebuild(cursor, 'core_tag')
+        rebuild(cursor, 'core_product')
+        cursor.execute(THROUGH_FOREIGN_KEYS_SQL)
+
+
+class Migration(migrations.Migration):
+    """Hash partition products and tags by user, and their links by product.
+
+    Every product and tag query is scoped to a user, so it reads a single
+    partition; the tags of products are read with
+    Product.objects.prefetch_tags(), which filters them by user as well.
+    The product tags table is partitioned by product instead: its model is
+    created by the ManyToManyField and has no user column, and every ORM
+    access to it filters by product.  Foreign keys to the partitioned
+    tables are dropped, PostgreSQL only enforces them against unique keys,
+    which must include the partition key; links are deleted along with
+    their product or tag by Django and by user.deletion.
+
+    The data is copied while the tables are locked, so large installations
+    should run this in a maintenance window.
+    """
+
+    dependencies = [
+        ('core', '0011_accountdeletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
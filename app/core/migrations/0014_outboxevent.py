@@ -0,0 +1,84 @@
+# Generated by Django 2.1.15 on 2026-10-19 06:20
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+
+
+TRIGGERS_SQL = """
+CREATE FUNCTION core_outbox_row() RETURNS trigger AS $$
+DECLARE
+    changed record;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    INSERT INTO core_outboxevent (topic, action, object_id, payload,
+                                  created_at)
+    VALUES (TG_ARGV[0], lower(TG_OP), changed.id, to_jsonb(changed), now());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only the current score of users is published, never their other columns
+CREATE FUNCTION core_outbox_user_score() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_outboxevent (topic, action, object_id, payload,
+                                  created_at)
+    VALUES ('user.scores_final', 'update', NEW.id,
+            jsonb_build_object('id', NEW.id,
+                               'scores_final_id', NEW.scores_final_id),
+            now());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_product_outbox
+    AFTER INSERT OR UPDATE OR DELETE ON core_product
+    FOR EACH ROW EXECUTE PROCEDURE core_outbox_row('product');
+-- Counter updates are not changes of the tag
+CREATE TRIGGER core_tag_outbox
+    AFTER INSERT OR UPDATE OF name, user_id OR DELETE ON core_tag
+    FOR EACH ROW EXECUTE PROCEDURE core_outbox_row('tag');
+CREATE TRIGGER core_score_outbox
+    AFTER INSERT OR UPDATE OR DELETE ON core_score
+    FOR EACH ROW EXECUTE PROCEDURE core_outbox_row('score');
+CREATE TRIGGER core_user_outbox
+    AFTER UPDATE OF scores_final_id ON core_user
+    FOR EACH ROW
+    WHEN (OLD.scores_final_id IS DISTINCT FROM NEW.scores_final_id)
+    EXECUTE PROCEDURE core_outbox_user_score();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_user_outbox ON core_user;
+DROP TRIGGER core_score_outbox ON core_score;
+DROP TRIGGER core_tag_outbox ON core_tag;
+DROP TRIGGER core_product_outbox ON core_product;
+DROP FUNCTION core_outbox_user_score();
+DROP FUNCTION core_outbox_row();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=20)),
+                ('action', models.CharField(max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('payload', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-19 06:51
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_dashboard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='zipcode',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MaxValueValidator(99999)], verbose_name='zipcode'),
+        ),
+    ]
@@ -2,10 +2,12 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.core.validators import MaxValueValidator, MinValueValidator, \
-                                   MinLengthValidator, MaxLengthValidator, \
                                    DecimalValidator, RegexValidator
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 class UserManager(BaseUserManager):
@@ -64,12 +66,11 @@ class User(AbstractBaseUser, PermissionsMixin):
                                                 MaxValueValidator(150)
                                            ],
                                            blank=True, null=True)
-    zipcode = models.PositiveSmallIntegerField(_('zipcode'),
-                                               validators=[
-                                                    MinLengthValidator(5),
-                                                    MaxLengthValidator(5)
-                                               ],
-                                               blank=True, null=True)
+    zipcode = models.PositiveIntegerField(_('zipcode'),
+                                          validators=[
+                                               MaxValueValidator(99999)
+                                          ],
+                                          blank=True, null=True)
     income = models.DecimalField(_('income'), max_digits=10, decimal_places=2,
                                  validators=[DecimalValidator], blank=True,
                                  null=True)
@@ -90,6 +91,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     date_joined = models.DateTimeField(_('registered'), auto_now_add=True,
                                        null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
@@ -118,19 +120,56 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 class Tag(models.Model):
-    """Tags to be used for products"""
+    """Tags to be used for products.
+
+    The table is hash partitioned on user_id, see migration 0012, so
+    queries should filter by user and other tables cannot reference it with
+    a foreign key constraint.
+    """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Denormalized number of products carrying this tag, maintained by the
+    # signal handlers in core.signals
+    product_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set by database triggers on every change, see migration 0010
+    change_txid = models.BigIntegerField(default=0, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-product_count'],
+                         name='core_tag_user_count_idx'),
+            models.Index(fields=['user', 'change_txid', 'change_seq'],
+                         name='core_tag_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """QuerySet of products reading tags from their owner's partition"""
+
+    def prefetch_tags(self, user):
+        """Prefetch the tags of products of user from its partition only.
+
+        Joining tags by id alone would probe every tag partition.
+        """
+        return self.prefetch_related(models.Prefetch(
+            'tags', queryset=Tag.objects.filter(user=user)
+        ))
+
+
 class Product(models.Model):
-    """Product object"""
+    """Product object.
+
+    Partitioned on user_id like Tag; the tags through table is partitioned
+    on product_id.  Read tags with ProductQuerySet.prefetch_tags().
+    """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -139,17 +178,96 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
+    # Also bumped by core.signals when the tags of the product change
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set by database triggers on every change, see migration 0010
+    change_txid = models.BigIntegerField(default=0, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_product_user_upd_idx'),
+            models.Index(fields=['user', 'change_txid', 'change_seq'],
+                         name='core_product_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class ScoreText(models.Model):
+    """Description text shared by many scores, stored once"""
+    digest = models.CharField(max_length=32, unique=True)
+    text = models.TextField()
+
+    def __str__(self):
+        return self.text
+
+
+class Tombstone(models.Model):
+    """Record of a deleted product or tag, written by a database trigger.
+
+    user is not a constraint so tombstones written while a user's rows are
+    cascade deleted do not block the deletion of the user.
+    """
+    PRODUCT = 'product'
+    TAG = 'tag'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=10)
+    object_id = models.IntegerField()
+    change_txid = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_txid', 'change_seq'],
+                         name='core_tomb_user_change_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.kind, self.object_id)
+
+
+class AccountDeletion(models.Model):
+    """Progress of purging a deactivated account, see user.deletion.
+
+    user is not a constraint so the record outlives the account.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    requested_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Number of rows deleted so far, by table
+    deleted = JSONField(default=dict, blank=True)
+    batches = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return 'user %s: %d rows in %d batches%s' % (
+            self.user_id, sum(self.deleted.values()), self.batches,
+            ', done' if self.finished_at else ''
+        )
+
+
 class Score(models.Model):
     """Score object"""
     MIN_SCORE = 0
     MAX_Score = 100
 
     version = models.CharField(max_length=5, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     score_overall = models.PositiveSmallIntegerField(
                                            _('overall score'),
@@ -194,12 +312,175 @@ class Score(models.Model):
                                            ],
                                            blank=True, null=True)
 
-    desc_overall = models.TextField(blank=True, null=True)
-    desc_medical = models.TextField(blank=True, null=True)
-    desc_income = models.TextField(blank=True, null=True)
-    desc_stuff = models.TextField(blank=True, null=True)
-    desc_liability = models.TextField(blank=True, null=True)
-    desc_digital = models.TextField(blank=True, null=True)
+    # Descriptions are interned in ScoreText, see score.descriptions
+    desc_overall = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
+    desc_medical = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
+    desc_income = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
+    desc_stuff = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
+    desc_liability = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
+    desc_digital = models.ForeignKey(
+        'ScoreText', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+'
+    )
 
     def __str__(self):
         return str(self.score_overall)
+
+
+class ScoreHistory(models.Model):
+    """Append-only record of every score given to a user.
+
+    The table is range partitioned on created_at, see migration 0007.
+    User.scores_initial and User.scores_final point at the scores of the
+    first and latest rows so current scores never touch this table.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='score_history'
+    )
+    score = models.ForeignKey(
+        'Score',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'],
+                         name='core_scorehist_user_idx'),
+        ]
+
+    def __str__(self):
+        return '%s @ %s' % (self.score, self.created_at)
+
+
+class ScoreBucket(models.Model):
+    """Number of users whose final score has a given value in one segment.
+
+    Rows are maintained incrementally from the score app so analytics never
+    scan the Score table.  Empty strings stand for unknown segment values.
+    """
+    metric = models.CharField(max_length=20)
+    education = models.CharField(max_length=50, blank=True, default='')
+    employment = models.CharField(max_length=50, blank=True, default='')
+    age_band = models.CharField(max_length=10, blank=True, default='')
+    value = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            ('metric', 'education', 'employment', 'age_band', 'value'),
+        )
+
+    def __str__(self):
+        return '%s=%s' % (self.metric, self.value)
+
+
+class Job(models.Model):
+    """Background job stored in the database, see core.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed')
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=255)
+    payload = JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_at'],
+                         name='core_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return '%s [%s]' % (self.task, self.status)
+
+
+class SlowQuery(models.Model):
+    """Aggregate of the sampled slow executions of one query shape.
+
+    Rows are upserted by core.slow_queries and read by the slow_queries
+    management command.
+    """
+    fingerprint = models.CharField(max_length=32, unique=True)
+    sql = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    calls = models.PositiveIntegerField(default=0)
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '%s (%d calls)' % (self.fingerprint, self.calls)
+
+
+class OutboxEvent(models.Model):
+    """Change to a product, tag, score or current user score.
+
+    Rows are written by database triggers in the transaction of the change,
+    see migration 0014, and deleted by core.outbox once delivered.
+    """
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=20)
+    action = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    payload = JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '%s %s %s' % (self.topic, self.action, self.object_id)
+
+
+class Dashboard(models.Model):
+    """Home screen document of a user, kept up to date by user.dashboard.
+
+    user is not a constraint since deleting a user's products refreshes
+    the document before the user row goes; user.signals deletes it after.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+'
+    )
+    document = JSONField(default=dict, encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return 'dashboard of user %s' % self.user_id
@@ -0,0 +1,213 @@
+"""Delivery of outbox events to downstream services.
+
+Database triggers add a core.OutboxEvent row in the transaction of every
+change to a product, tag or score and of every new current user score.
+relay() sends the events, oldest first, in batches to a sink and deletes
+each batch once the sink accepted it, so delivery is at least once: a
+batch is sent again if the relay stops before acknowledging it.  Events
+are deleted rather than read past a cursor, so one committing out of id
+order is still sent.  Only one relay runs at a time, so events go out in
+id order, apart from those committed after higher ids were sent.
+
+Sinks are given as file:<path>, unix:<socket path>, http(s)://<url> or the
+dotted path of a Sink subclass.
+"""
+import json
+import logging
+import socket
+import time
+import urllib.request
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'core.outbox'
+
+
+def message(event):
+    """Return the message sent for an event"""
+    return {
+        'id': event.id,
+        'topic': event.topic,
+        'action': event.action,
+        'object_id': event.object_id,
+        'payload': event.payload,
+        'created_at': event.created_at,
+    }
+
+
+def encode(messages):
+    """Return messages as JSON lines"""
+    return b''.join(json.dumps(item, cls=DjangoJSONEncoder).encode() + b'\n'
+                    for item in messages)
+
+
+class Sink:
+    """Destination of events; send() raises unless all were accepted"""
+
+    def send(self, messages):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileSink(Sink):
+    """Appends events to a file as JSON lines"""
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+
+    def send(self, messages):
+        self.file.write(encode(messages))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSink(Sink):
+    """Writes events as JSON lines to a local stream socket.
+
+    The peer acknowledges each batch with a line holding the number of
+    events it received.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = path
+        self.timeout = timeout
+        self.socket = None
+
+    def send(self, messages):
+        if self.socket is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(self.timeout)
+            self.socket.connect(self.path)
+            self.reader = self.socket.makefile('rb')
+        try:
+            self.socket.sendall(encode(messages))
+            ack = self.reader.readline()
+            if int(ack or -1) != len(messages):
+                raise IOError('Socket sink acknowledged %r' % ack)
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self):
+        if self.socket is not None:
+            self.reader.close()
+            self.socket.close()
+            self.socket = None
+
+
+class HTTPSink(Sink):
+    """POSTs each batch as a JSON array, accepted by any 2xx response"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, messages):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(messages, cls=DjangoJSONEncoder).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        # urlopen raises HTTPError for responses other than 2xx
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def get_sink(spec):
+    """Return the sink described by a spec"""
+    scheme, _, rest = spec.partition(':')
+    if scheme == 'file':
+        return FileSink(rest)
+    if scheme == 'unix':
+        return SocketSink(rest)
+    if scheme in ('http', 'https'):
+        return HTTPSink(spec)
+    return import_string(spec)()
+
+
+def lock():
+    """Take the relay lock for this connection, return whether it was free"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(hashtext(%s))',
+                       [LOCK_KEY])
+        return cursor.fetchone()[0]
+
+
+def relay_batch(sink, batch_size=500):
+    """Send the oldest events to a sink and acknowledge them.
+
+    Returns the number of events delivered.
+    """
+    events = list(OutboxEvent.objects.order_by('id')[:batch_size])
+    if not events:
+        return 0
+    sink.send([message(event) for event in events])
+    OutboxEvent.objects.filter(id__in=[event.id for event in events]) \
+        .delete()
+    return len(events)
+
+
+def lag():
+    """Return about how many events are pending and the oldest one's age.
+
+    The count is the span of pending ids, which avoids counting the table.
+    """
+    stats = OutboxEvent.objects.aggregate(
+        first=Min('id'), last=Max('id'), oldest=Min('created_at')
+    )
+    if stats['first'] is None:
+        return 0, 0.0
+    return (stats['last'] - stats['first'] + 1,
+            (timezone.now() - stats['oldest']).total_seconds())
+
+
+def relay(sink, batch_size=500, poll_interval=1, burst=False,
+          report_interval=60, report=logger.info):
+    """Deliver events until stopped, or until none are left when burst.
+
+    Failed sends are retried with exponential backoff, except in burst
+    mode where they raise.  Throughput and lag are reported every
+    report_interval seconds.
+    """
+    delivered = 0
+    delay = poll_interval
+    reported_at = time.monotonic()
+    while True:
+        try:
+            count = relay_batch(sink, batch_size)
+        except Exception:
+            if burst:
+                raise
+            logger.exception('Outbox sink failed, retrying in %ss', delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+            continue
+        delay = poll_interval
+        delivered += count
+        now = time.monotonic()
+        if now - reported_at >= report_interval or (burst and not count):
+            pending, age = lag()
+            report('Outbox: %d events delivered at %.1f/s, %d pending, '
+                   'oldest %.1fs old' % (
+                       delivered, delivered / max(now - reported_at, 1e-9),
+                       pending, age
+                   ))
+            delivered = 0
+            reported_at = now
+        if not count:
+            if burst:
+                return
+            time.sleep(poll_interval)
@@ -0,0 +1,161 @@
+"""Server-side prepared statements for hot queries.
+
+With PREPARED_STATEMENTS on, install() gives each new database connection a
+PreparedStatements execute wrapper; CoreConfig connects it to
+connection_created.  Once a connection has run the same SELECT text
+PREPARED_STATEMENT_THRESHOLD times, the wrapper PREPAREs it under a name
+derived from the text and runs it, and every later execution, as EXECUTE
+name(params), so PostgreSQL skips parsing and, once it settles on a
+generic plan, planning.  Django emits the same text for every execution of
+a queryset shape, such as the token lookup or a user's product or tag
+list, so the hot statements are found without listing them.  At most
+PREPARED_STATEMENT_CACHE_SIZE statements are kept per connection; the
+least recently used is deallocated.  Statements on server-side (named)
+cursors, as used by QuerySet.iterator(), are left alone.
+
+A schema change can make a prepared statement fail with "cached plan must
+not change result type".  The statement is then deallocated and the query
+run as plain SQL; inside a transaction the failure has already aborted it,
+so the error is raised once and the next execution prepares the statement
+again.
+
+Prepared statements live in the database session, so this must stay off
+behind a pooler like pgbouncer in transaction mode.
+"""
+import hashlib
+import re
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError
+
+from psycopg2 import errorcodes
+
+
+PLACEHOLDER = re.compile(r'%([s%])')
+
+
+def server_sql(sql):
+    """Return Django SQL with %s placeholders numbered as $1, $2..."""
+    numbers = iter(range(1, sql.count('%s') + 1))
+
+    def replace(match):
+        return '%' if match.group(1) == '%' else '$%d' % next(numbers)
+    return PLACEHOLDER.sub(replace, sql)
+
+
+def statement_name(sql):
+    return 'core_%s' % hashlib.md5(sql.encode()).hexdigest()[:20]
+
+
+def execute_sql(name, params):
+    if not params:
+        return 'EXECUTE %s' % name
+    return 'EXECUTE %s(%s)' % (name, ', '.join(['%s'] * len(params)))
+
+
+class PreparedStatements:
+    """Execute wrapper preparing the statements a connection repeats"""
+
+    def __init__(self):
+        self.counts = OrderedDict()
+        self.prepared = OrderedDict()
+        self.failed = set()
+        # Names of statements invalidated by a schema change, deallocated
+        # once the connection can run statements again
+        self.stale = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if (not getattr(settings, 'PREPARED_STATEMENTS', False) or many or
+                not isinstance(params, (list, tuple)) or
+                not sql.startswith('SELECT') or sql in self.failed or
+                context['cursor'].cursor.name is not None):
+            return execute(sql, params, many, context)
+
+        name = self.prepared.get(sql)
+        if name is not None:
+            self.prepared.move_to_end(sql)
+        elif self.seen(sql):
+            name = self.prepare(context['connection'], sql)
+        if name is None:
+            return execute(sql, params, many, context)
+        try:
+            return execute(execute_sql(name, params), params, many, context)
+        except NotSupportedError as exc:
+            if getattr(exc.__cause__, 'pgcode', None) != \
+                    errorcodes.FEATURE_NOT_SUPPORTED:
+                raise
+            # The result type of the statement changed under it
+            del self.prepared[sql]
+            self.stale.append(name)
+            connection = context['connection']
+            if connection.in_atomic_block:
+                raise
+            self.deallocate_stale(connection)
+            return execute(sql, params, many, context)
+
+    def seen(self, sql):
+        """Count an execution, return whether the statement became hot"""
+        threshold = getattr(settings, 'PREPARED_STATEMENT_THRESHOLD', 5)
+        count = self.counts.pop(sql, 0) + 1
+        if count >= threshold:
+            return True
+        self.counts[sql] = count
+        if len(self.counts) > 10 * self.cache_size():
+            self.counts.popitem(last=False)
+        return False
+
+    def cache_size(self):
+        return getattr(settings, 'PREPARED_STATEMENT_CACHE_SIZE', 100)
+
+    def run(self, connection, statement):
+        """Run a statement on a new cursor of the underlying connection.
+
+        The cursor of the query being executed may be unusable for it, and
+        this keeps the statement out of Django's query log.
+        """
+        with connection.wrap_database_errors, \
+                connection.connection.cursor() as cursor:
+            cursor.execute(statement)
+
+    def deallocate_stale(self, connection):
+        while self.stale:
+            self.run(connection, 'DEALLOCATE %s' % self.stale[-1])
+            self.stale.pop()
+
+    def prepare(self, connection, sql):
+        """PREPARE a statement, return its name or None if it cannot be.
+
+        Inside a transaction a savepoint keeps a failed PREPARE, such as
+        one with a parameter whose type cannot be inferred, from aborting
+        it.
+        """
+        name = statement_name(sql)
+        self.deallocate_stale(connection)
+        savepoint = connection.in_atomic_block
+        if savepoint:
+            self.run(connection, 'SAVEPOINT core_prepare')
+        try:
+            self.run(connection, 'PREPARE %s AS %s' % (name, server_sql(sql)))
+        except DatabaseError:
+            self.failed.add(sql)
+            if savepoint:
+                self.run(connection, 'ROLLBACK TO SAVEPOINT core_prepare')
+            return None
+        finally:
+            if savepoint:
+                self.run(connection, 'RELEASE SAVEPOINT core_prepare')
+        if len(self.prepared) >= self.cache_size():
+            _, oldest = self.prepared.popitem(last=False)
+            self.run(connection, 'DEALLOCATE %s' % oldest)
+        self.prepared[sql] = name
+        return name
+
+
+def install(sender=None, connection=None, **kwargs):
+    """Give a connection its own PreparedStatements, for connection_created"""
+    connection.execute_wrappers[:] = [
+        wrapper for wrapper in connection.execute_wrappers
+        if not isinstance(wrapper, PreparedStatements)
+    ]
+    connection.execute_wrappers.append(PreparedStatements())
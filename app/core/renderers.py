@@ -0,0 +1,129 @@
+"""Renderers and parsers for JSON and MessagePack.
+
+JSON uses orjson when it is installed.  Without orjson, or when indented
+output is requested, rendering falls back to the stdlib encoder.  Request
+bodies with numbers that have a fraction or an exponent are always parsed
+by json.load() into Decimal, so they never pass through float; only bodies
+without such numbers are parsed by orjson.
+
+Both formats encode values the same way, so clients can share decoding:
+decimals are strings of their exact digits, the output DRF produces with
+COERCE_DECIMAL_TO_STRING, and never pass through float; datetimes are ISO
+8601 strings, with 'Z' for UTC.  MessagePack uses the
+application/msgpack media type.
+"""
+import codecs
+import decimal
+import json
+import re
+
+from django.conf import settings
+
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+from rest_framework.utils.json import strict_constant
+
+import msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class DecimalEncoder(encoders.JSONEncoder):
+    """DRF's JSON encoder, rendering decimals as exact strings"""
+
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+_fallback_encoder = DecimalEncoder()
+
+
+def _default(obj):
+    return _fallback_encoder.default(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSON renderer serializing with orjson when available"""
+    encoder_class = DecimalEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(
+                accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default)
+        except orjson.JSONEncodeError:
+            # Such as the integer keys of ListField errors
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # Keep output a strict JavaScript subset, as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# A JSON number with a fraction or an exponent always has a digit right
+# before its '.', 'e' or 'E'; matches inside strings only cost the fast path
+FRACTIONAL_NUMBER = re.compile(rb'[0-9][.eE]')
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSON parser using orjson for bodies without fractional numbers.
+
+    orjson would parse those numbers into floats, so such bodies go to the
+    stdlib parser, which reads them into Decimal.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            if orjson is not None and encoding.lower() in ('utf-8', 'utf8'):
+                body = stream.read()
+                if not FRACTIONAL_NUMBER.search(body):
+                    return orjson.loads(body)
+                return json.loads(body.decode(encoding),
+                                  parse_float=decimal.Decimal,
+                                  parse_constant=self.parse_constant())
+            decoded_stream = codecs.getreader(encoding)(stream)
+            return json.load(decoded_stream, parse_float=decimal.Decimal,
+                             parse_constant=self.parse_constant())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+    def parse_constant(self):
+        return strict_constant if self.strict else None
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renderer which serializes to MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(parsers.BaseParser):
+    """Parses MessagePack request bodies"""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,85 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Product
+
+
+ProductTags = Product.tags.through
+
+
+def _bump_tags(user_id, tag_ids, delta):
+    """Add delta to the product counter of the given tags of a user"""
+    if tag_ids:
+        Tag.objects.filter(user_id=user_id, pk__in=tag_ids).update(
+            product_count=F('product_count') + delta
+        )
+
+
+@receiver(m2m_changed, sender=ProductTags)
+def update_tag_product_count(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Keep Tag.product_count in step with the product-tags links.
+
+    Removals are counted before the rows go away so that only links which
+    actually exist are decremented; Django runs the whole m2m operation in
+    one transaction, so a failed removal rolls the counter back as well.
+    """
+    if not reverse:
+        if action == 'post_add':
+            _bump_tags(instance.user_id, pk_set, 1)
+        elif action in ('pre_remove', 'pre_clear'):
+            links = ProductTags.objects.filter(product_id=instance.pk)
+            if action == 'pre_remove':
+                links = links.filter(tag_id__in=pk_set)
+            _bump_tags(instance.user_id,
+                       list(links.values_list('tag_id', flat=True)), -1)
+        return
+
+    if action == 'post_add':
+        delta = len(pk_set)
+    elif action == 'pre_remove':
+        delta = -ProductTags.objects.filter(
+            tag_id=instance.pk, product_id__in=pk_set
+        ).count()
+    elif action == 'pre_clear':
+        delta = -ProductTags.objects.filter(tag_id=instance.pk).count()
+    else:
+        return
+    if delta:
+        _bump_tags(instance.user_id, [instance.pk], delta)
+
+
+@receiver(pre_delete, sender=Product)
+def release_product_tags(sender, instance, **kwargs):
+    """Decrement the counters of all tags of a product being deleted"""
+    tag_ids = ProductTags.objects.filter(
+        product_id=instance.pk
+    ).values_list('tag_id', flat=True)
+    _bump_tags(instance.user_id, list(tag_ids), -1)
+
+
+@receiver(m2m_changed, sender=ProductTags)
+def touch_tagged_products(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Bump updated_at of products whose set of tags changes"""
+    if action not in ('post_add', 'pre_remove', 'pre_clear') or \
+            (action == 'post_add' and not pk_set):
+        return
+    now = timezone.now()
+    products = Product.objects.filter(user_id=instance.user_id)
+    if not reverse:
+        products.filter(pk=instance.pk).update(updated_at=now)
+        instance.updated_at = now
+    elif action == 'pre_clear':
+        products.filter(tags=instance).update(updated_at=now)
+    elif pk_set:
+        products.filter(pk__in=pk_set).update(updated_at=now)
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_products_of_deleted_tag(sender, instance, **kwargs):
+    """Bump updated_at of products losing a deleted tag"""
+    Product.objects.filter(user_id=instance.user_id, tags=instance) \
+        .update(updated_at=timezone.now())
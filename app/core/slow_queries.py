@@ -0,0 +1,172 @@
+"""Capture of slow SQL queries.
+
+install() adds a SlowQueryRecorder execute wrapper to each new database
+connection; CoreConfig connects it to connection_created.  Queries taking
+SLOW_QUERY_THRESHOLD milliseconds or more are sampled at
+SLOW_QUERY_SAMPLE_RATE and, at most SLOW_QUERY_MAX_PER_MINUTE times a minute
+per process, logged with the view being served and their EXPLAIN plan.
+Each recorded query is added to the core.SlowQuery row of its fingerprint,
+the query text with literals and parameters replaced by ?.  The row is
+written on a short-lived autocommit connection of its own, so the lock on
+it is never held until the end of the caller's transaction, and the record
+survives if that transaction rolls back.
+
+QueryAttributionMiddleware names the view of the current request.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+UPSERT_SQL = """
+INSERT INTO core_slowquery (fingerprint, sql, view, calls, total_time,
+                            max_time, plan, first_seen, last_seen)
+VALUES (%s, %s, %s, 1, %s, %s, %s, %s, %s)
+ON CONFLICT (fingerprint) DO UPDATE SET
+    view = EXCLUDED.view,
+    calls = core_slowquery.calls + 1,
+    total_time = core_slowquery.total_time + EXCLUDED.total_time,
+    max_time = GREATEST(core_slowquery.max_time, EXCLUDED.max_time),
+    plan = CASE WHEN EXCLUDED.plan = '' THEN core_slowquery.plan
+                ELSE EXCLUDED.plan END,
+    last_seen = EXCLUDED.last_seen
+"""
+
+_local = threading.local()
+
+
+def set_view(name):
+    """Set the name of the view the current thread is serving"""
+    _local.view = name
+
+
+def current_view():
+    return getattr(_local, 'view', '')
+
+
+def fingerprint(sql):
+    """Return the normalized text of a query and its digest"""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    sql = sql.strip()
+    return sql, hashlib.md5(sql.encode()).hexdigest()
+
+
+def own_connection(connection):
+    """Return a new, unopened connection to the database of connection"""
+    wrapper = connections[connection.alias]
+    return type(wrapper)(dict(wrapper.settings_dict), wrapper.alias)
+
+
+class RateLimiter:
+    """Allows a number of events per minute, counted per process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.window = None
+        self.count = 0
+
+    def allow(self, per_minute):
+        window = int(time.monotonic() // 60)
+        with self.lock:
+            if window != self.window:
+                self.window = window
+                self.count = 0
+            if self.count >= per_minute:
+                return False
+            self.count += 1
+            return True
+
+
+class SlowQueryRecorder:
+    """Execute wrapper recording queries slower than the threshold"""
+
+    def __init__(self):
+        self.limiter = RateLimiter()
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD', None)
+        if threshold is None or getattr(_local, 'recording', False):
+            return execute(sql, params, many, context)
+
+        start = time.monotonic()
+        result = execute(sql, params, many, context)
+        duration = (time.monotonic() - start) * 1000
+        if duration >= threshold and self.sampled():
+            _local.recording = True
+            try:
+                self.record(context['connection'], sql, params, many,
+                            duration)
+            finally:
+                _local.recording = False
+        return result
+
+    def sampled(self):
+        """Return whether to record a slow query"""
+        rate = getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+        if random.random() >= rate:
+            return False
+        return self.limiter.allow(
+            getattr(settings, 'SLOW_QUERY_MAX_PER_MINUTE', 30)
+        )
+
+    def explain(self, connection, sql, params):
+        """Return the plan of a query without running it"""
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN (ANALYZE off) ' + sql, params)
+                    return '\n'.join(row[0] for row in cursor.fetchall())
+        except DatabaseError as exc:
+            return 'EXPLAIN failed: %s' % exc
+
+    def record(self, connection, sql, params, many, duration):
+        """Log a slow query and add it to its fingerprint's aggregate"""
+        normalized, digest = fingerprint(sql)
+        plan = ''
+        if not many and sql.lstrip().upper().startswith(EXPLAINABLE):
+            plan = self.explain(connection, sql, params)
+        view = current_view()
+        logger.warning('Slow query (%.1f ms) in %s: %s\n%s', duration,
+                       view or '-', sql, plan)
+
+        now = timezone.now()
+        writer = own_connection(connection)
+        try:
+            with writer.cursor() as cursor:
+                cursor.execute(UPSERT_SQL, [
+                    digest, normalized, view[:255], duration, duration,
+                    plan, now, now
+                ])
+        except DatabaseError as exc:
+            logger.warning('Could not record slow query %s: %s', digest, exc)
+        finally:
+            writer.close()
+
+
+recorder = SlowQueryRecorder()
+
+
+def install(sender=None, connection=None, **kwargs):
+    """Add the recorder to a connection, for connection_created"""
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recorder)
@@ -0,0 +1,60 @@
+"""Sparse fieldsets selected with a ?fields=a,b,c query parameter"""
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer mixin keeping only the fields passed in the fields kwarg"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """View mixin applying ?fields= to reads of a sparse fields serializer.
+
+    Writes always use every field, since pruning would also drop
+    writable fields from the input.
+    """
+    fields_param = 'fields'
+
+    def requested_fields(self):
+        """Return the set of requested fields, or None for all of them"""
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = None
+            param = self.request.query_params.get(self.fields_param)
+            if param and self.request.method in ('GET', 'HEAD'):
+                fields = {name.strip() for name in param.split(',')} - {''}
+                known = set(self.get_serializer_class()().fields)
+                unknown = fields - known
+                if unknown:
+                    raise ValidationError({self.fields_param: [
+                        'Unknown fields: %s' % ', '.join(sorted(unknown))
+                    ]})
+                self._requested_fields = fields
+        return self._requested_fields
+
+    def wants_field(self, name):
+        """Return whether a field is part of the response"""
+        fields = self.requested_fields()
+        return fields is None or name in fields
+
+    def only_columns(self, queryset):
+        """Restrict a queryset to the columns of the requested fields"""
+        fields = self.requested_fields()
+        if fields is None:
+            return queryset
+        serializer = self.get_serializer_class()()
+        sources = {serializer.fields[name].source for name in fields}
+        columns = [field.name for field in queryset.model._meta.concrete_fields
+                   if field.name in sources or field.attname in sources]
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
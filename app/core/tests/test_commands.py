@@ -2,8 +2,11 @@ from unittest.mock import patch
 
 from django.core.management import call_command
 from django.db.utils import OperationalError
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
+from core.models import Tag, Product
+
 
 class CommandTests(TestCase):
 
@@ -21,3 +24,19 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_rebuild_tag_counts(self):
+        """Test tag product counters are rebuilt from the links table"""
+        user = get_user_model().objects.create_user('4086432477', 'testpass')
+        tag = Tag.objects.create(user=user, name='Insurance')
+        unused = Tag.objects.create(user=user, name='Warranty')
+        product = Product.objects.create(user=user, title='auto', price=20)
+        product.tags.add(tag)
+        Tag.objects.update(product_count=7)
+
+        call_command('rebuild_tag_counts')
+
+        tag.refresh_from_db()
+        unused.refresh_from_db()
+        self.assertEqual(tag.product_count, 1)
+        self.assertEqual(unused.product_count, 0)
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+calls = []
+
+
+def record(**payload):
+    """Task recording its payload"""
+    calls.append(payload)
+
+
+def explode(**payload):
+    """Task that always fails"""
+    raise RuntimeError('boom')
+
+
+def release_all(**payload):
+    """Task standing in for another worker releasing running jobs"""
+    Job.objects.filter(status=Job.RUNNING).update(
+        locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2
+    )
+    jobs.release_stale('default')
+
+
+class JobQueueTests(TestCase):
+    """Test the database backed job queue"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Test a queued job is run with its payload"""
+        job = jobs.enqueue(record, product_id=3)
+
+        ran = jobs.Worker().run_once()
+
+        job.refresh_from_db()
+        self.assertEqual(ran, 1)
+        self.assertEqual(calls, [{'product_id': 3}])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_future_jobs_not_claimed(self):
+        """Test jobs are not run before their run_at time"""
+        jobs.enqueue(record, run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.Worker().run_once(), 0)
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is requeued later, then marked failed"""
+        job = jobs.enqueue(explode, max_attempts=2)
+
+        jobs.Worker().run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        jobs.Worker().run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOB_QUEUES={'slow': {'concurrency': 2}})
+    def test_queue_concurrency_limit(self):
+        """Test claims never exceed the running job limit of a queue"""
+        for _ in range(3):
+            jobs.enqueue(record, queue='slow')
+        Job.objects.filter(id=Job.objects.first().id) \
+            .update(status=Job.RUNNING, locked_at=timezone.now())
+
+        claimed = jobs.claim('slow', 'test', 10)
+
+        self.assertEqual(len(claimed), 1)
+
+    def test_stale_jobs_released(self):
+        """Test running jobs of a dead worker are requeued"""
+        job = jobs.enqueue(record)
+        Job.objects.filter(id=job.id).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2
+        )
+
+        jobs.Worker().run_once()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_released_jobs_of_batch_not_run(self):
+        """Test jobs requeued while waiting in a batch are left alone"""
+        first = jobs.enqueue(release_all)
+        second = jobs.enqueue(record)
+
+        ran = jobs.Worker(batch_size=2).run_once()
+
+        self.assertEqual(ran, 1)
+        self.assertEqual(calls, [])
+        for job in (first, second):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+
+    def test_lost_job_outcome_not_recorded(self):
+        """Test a worker does not overwrite a job another worker claimed"""
+        jobs.enqueue(record)
+        job, = jobs.claim('default', 'first', 1)
+        Job.objects.filter(id=job.id).update(
+            locked_by='second', attempts=job.attempts + 1
+        )
+
+        jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'second')
+
+    def test_worker_burst_drains_queue(self):
+        """Test a burst worker runs every due job and returns"""
+        jobs.enqueue(record, queue='other', value=1)
+        jobs.enqueue(record, queue='other', value=2)
+
+        jobs.Worker(['other'], batch_size=1).run(burst=True)
+
+        self.assertEqual(calls, [{'value': 1}, {'value': 2}])
+
+    @patch('core.management.commands.run_worker.Worker')
+    def test_run_worker_starts_threads(self, worker):
+        """Test the run_worker command runs one worker per thread"""
+        call_command('run_worker', '--queue', 'other', '--threads', '3',
+                     '--burst')
+
+        self.assertEqual(worker.call_count, 3)
+        self.assertEqual(worker.call_args[0][0], ['other'])
+        self.assertEqual(worker.return_value.run.call_count, 3)
@@ -1,3 +1,5 @@
+import re
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -9,6 +11,11 @@ def sample_user(phone_number='4086432477', password='testpass'):
     return get_user_model().objects.create_user(phone_number, password)
 
 
+def scanned_partitions(plan, model):
+    """Return the partitions of a model's table read by a query plan"""
+    return set(re.findall(r' on (%s_p\d+)' % model._meta.db_table, plan))
+
+
 class ModelTests(TestCase):
 
     def test_create_user_with_phone_number_successful(self):
@@ -70,3 +77,67 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(score), str(score.score_overall))
+
+    def test_tag_product_count_tracks_links(self):
+        """Test the tag product counter follows add, remove and clear"""
+        user = sample_user()
+        tag1 = models.Tag.objects.create(user=user, name='Insurance')
+        tag2 = models.Tag.objects.create(user=user, name='Warranty')
+        product = models.Product.objects.create(
+            user=user, title='auto', price=20.00
+        )
+        other = models.Product.objects.create(
+            user=user, title='home', price=30.00
+        )
+
+        product.tags.add(tag1, tag2)
+        product.tags.add(tag1)
+        tag1.product_set.add(other)
+        tag1.refresh_from_db()
+        tag2.refresh_from_db()
+        self.assertEqual(tag1.product_count, 2)
+        self.assertEqual(tag2.product_count, 1)
+
+        product.tags.remove(tag2)
+        product.tags.remove(tag2)
+        tag2.refresh_from_db()
+        self.assertEqual(tag2.product_count, 0)
+
+        tag1.product_set.clear()
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.product_count, 0)
+
+    def test_tag_product_count_on_product_delete(self):
+        """Test deleting a product releases its tags"""
+        user = sample_user()
+        tag = models.Tag.objects.create(user=user, name='Insurance')
+        product = models.Product.objects.create(
+            user=user, title='auto', price=20.00
+        )
+        product.tags.set([tag])
+
+        product.delete()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.product_count, 0)
+
+    def test_user_queries_read_one_partition(self):
+        """Test product and tag queries by user scan a single partition"""
+        user = sample_user()
+
+        for model in (models.Product, models.Tag):
+            plan = model.objects.filter(user=user).explain()
+
+            self.assertEqual(len(scanned_partitions(plan, model)), 1, plan)
+
+    def test_product_tags_read_one_partition(self):
+        """Test reading the tags of a product scans a single partition"""
+        product = models.Product.objects.create(
+            user=sample_user(), title='auto', price=20.00
+        )
+
+        plan = product.tags.all().explain()
+
+        self.assertEqual(
+            len(scanned_partitions(plan, models.Product.tags.through)), 1, plan
+        )
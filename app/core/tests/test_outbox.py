@@ -0,0 +1,176 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import outbox
+from core.models import OutboxEvent, Product, Score, Tag
+
+from score.history import record_score
+
+
+class ListSink(outbox.Sink):
+    """Sink collecting batches in memory, failing while told to"""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+
+    def send(self, messages):
+        if self.failing:
+            raise IOError('Sink down')
+        self.batches.append(messages)
+
+
+def sample_score():
+    """Create and return a sample score"""
+    return Score.objects.create(
+        version='0.0', score_overall=50, score_medical=10, score_income=20,
+        score_stuff=30, score_liability=40, score_digital=50
+    )
+
+
+class OutboxTests(TestCase):
+    """Test writing and relaying outbox events"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            '4086432477', 'testpass'
+        )
+
+    def events(self):
+        return list(OutboxEvent.objects.order_by('id').values_list(
+            'topic', 'action', 'object_id'
+        ))
+
+    def test_product_changes_write_events(self):
+        """Test product inserts, updates and deletes are recorded"""
+        product = Product.objects.create(user=self.user, title='Car',
+                                         price=10)
+        product.title = 'Bike'
+        product.save()
+        product_id = product.id
+        product.delete()
+
+        self.assertEqual(self.events(), [
+            ('product', 'insert', product_id),
+            ('product', 'update', product_id),
+            ('product', 'delete', product_id),
+        ])
+        event = OutboxEvent.objects.get(action='update')
+        self.assertEqual(event.payload['title'], 'Bike')
+        self.assertEqual(event.payload['user_id'], self.user.id)
+
+    def test_tag_counter_updates_not_recorded(self):
+        """Test tag events are only written for changes of the tag"""
+        tag = Tag.objects.create(user=self.user, name='Insurance')
+        product = Product.objects.create(user=self.user, title='Car',
+                                         price=10)
+        OutboxEvent.objects.all().delete()
+
+        product.tags.add(tag)
+
+        self.assertEqual(self.events(), [('product', 'update', product.id)])
+
+    def test_score_changes_write_events(self):
+        """Test new scores and current user scores are recorded"""
+        score = sample_score()
+        record_score(self.user, score)
+
+        self.assertEqual(self.events(), [
+            ('score', 'insert', score.id),
+            ('user.scores_final', 'update', self.user.id),
+        ])
+        event = OutboxEvent.objects.get(topic='user.scores_final')
+        self.assertEqual(event.payload, {'id': self.user.id,
+                                         'scores_final_id': score.id})
+
+    def test_relay_batches_in_order(self):
+        """Test events are sent oldest first and deleted once accepted"""
+        for title in 'abc':
+            Product.objects.create(user=self.user, title=title, price=10)
+        sink = ListSink()
+
+        outbox.relay(sink, batch_size=2, burst=True, report=lambda text: 0)
+
+        self.assertEqual([len(batch) for batch in sink.batches], [2, 1])
+        titles = [item['payload']['title']
+                  for batch in sink.batches for item in batch]
+        self.assertEqual(titles, ['a', 'b', 'c'])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_batch_kept(self):
+        """Test events are kept when the sink fails"""
+        Product.objects.create(user=self.user, title='Car', price=10)
+        sink = ListSink()
+        sink.failing = True
+
+        with self.assertRaises(IOError):
+            outbox.relay_batch(sink)
+
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        sink.failing = False
+        self.assertEqual(outbox.relay_batch(sink), 1)
+
+    def test_lag(self):
+        """Test the lag reports pending events and their age"""
+        self.assertEqual(outbox.lag(), (0, 0.0))
+        Product.objects.create(user=self.user, title='Car', price=10)
+        Product.objects.create(user=self.user, title='Bike', price=10)
+
+        pending, age = outbox.lag()
+
+        self.assertEqual(pending, 2)
+        self.assertGreaterEqual(age, 0)
+
+    def test_socket_sink(self):
+        """Test the socket sink waits for the peer's acknowledgement"""
+        path = os.path.join(tempfile.mkdtemp(), 'outbox.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        received = []
+
+        def serve():
+            conn, _ = server.accept()
+            with conn, conn.makefile('rb') as reader:
+                lines = [reader.readline(), reader.readline()]
+                received.extend(json.loads(line) for line in lines)
+                conn.sendall(b'2\n')
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        sink = outbox.get_sink('unix:' + path)
+        try:
+            sink.send([{'id': 1}, {'id': 2}])
+        finally:
+            sink.close()
+            thread.join()
+            server.close()
+
+        self.assertEqual(received, [{'id': 1}, {'id': 2}])
+
+    def test_relay_outbox_command(self):
+        """Test the relay command drains the outbox into a file"""
+        Product.objects.create(user=self.user, title='Car', price=10)
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        out = StringIO()
+
+        try:
+            call_command('relay_outbox', '--sink', 'file:' + path, '--burst',
+                         stdout=out)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        finally:
+            os.remove(path)
+
+        self.assertEqual([line['topic'] for line in lines], ['product'])
+        self.assertIn('1 events delivered', out.getvalue())
+        self.assertFalse(OutboxEvent.objects.exists())
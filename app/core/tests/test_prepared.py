@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db import NotSupportedError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import prepared, slow_queries
+from core.models import Tag
+
+
+def prepared_statements():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM pg_prepared_statements "
+                       "WHERE name LIKE 'core\\_%'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+@override_settings(PREPARED_STATEMENTS=True, PREPARED_STATEMENT_THRESHOLD=2)
+class PreparedStatementTests(TestCase):
+    """Test preparing repeated queries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            '4086432477', 'testpass'
+        )
+        Tag.objects.create(user=self.user, name='Insurance')
+        Tag.objects.create(user=self.user, name='Car')
+        # Start each test without statements the fixtures made hot
+        with connection.cursor() as cursor:
+            cursor.execute('DEALLOCATE ALL')
+        prepared.install(connection=connection)
+
+    def tag_names(self, user=None):
+        return list(Tag.objects.filter(user=user or self.user)
+                    .order_by('-name').values_list('name', flat=True))
+
+    def test_server_sql(self):
+        """Test placeholders are numbered and percent signs unescaped"""
+        self.assertEqual(
+            prepared.server_sql(
+                "SELECT 1 WHERE a = %s AND b LIKE 'x%%' OR c = %s"
+            ),
+            "SELECT 1 WHERE a = $1 AND b LIKE 'x%' OR c = $2"
+        )
+
+    def test_repeated_query_executed_by_name(self):
+        """Test a query is prepared once it repeats and then executed"""
+        other = get_user_model().objects.create_user('4086432478', 'pw')
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.assertEqual(self.tag_names(), ['Insurance', 'Car'])
+            self.assertEqual(self.tag_names(other), [])
+
+        statements = [query['sql'] for query in queries
+                      if 'core_tag' in query['sql'] or
+                      query['sql'].startswith('EXECUTE')]
+        self.assertTrue(statements[0].startswith('SELECT'))
+        self.assertTrue(statements[1].startswith('EXECUTE core_'))
+        self.assertEqual(statements[1], statements[2])
+        self.assertTrue(statements[3].startswith('EXECUTE core_'))
+        name = statements[1].split()[1].split('(')[0]
+        self.assertIn(name, prepared_statements())
+
+    @override_settings(PREPARED_STATEMENTS=False)
+    def test_off_by_default(self):
+        """Test nothing is prepared unless enabled"""
+        before = prepared_statements()
+        for _ in range(3):
+            self.tag_names()
+
+        self.assertEqual(prepared_statements(), before)
+
+    def test_failed_prepare_keeps_transaction(self):
+        """Test a query which cannot be prepared still runs"""
+        sql = 'SELECT 1 WHERE %s IS NULL'
+        with connection.cursor() as cursor:
+            for _ in range(3):
+                cursor.execute(sql, [None])
+                self.assertEqual(cursor.fetchone(), (1,))
+
+        self.assertEqual(self.tag_names(), ['Insurance', 'Car'])
+
+    @override_settings(PREPARED_STATEMENT_CACHE_SIZE=1)
+    def test_least_recently_used_deallocated(self):
+        """Test statements beyond the cache size are deallocated"""
+        for _ in range(2):
+            self.tag_names()
+        first = prepared_statements()
+        for _ in range(2):
+            list(Tag.objects.filter(user=self.user).order_by('name'))
+
+        after = prepared_statements()
+        self.assertEqual(len(after), 1)
+        self.assertNotEqual(after, first)
+
+    def test_named_cursor_not_prepared(self):
+        """Test queries on server-side cursors run as they are"""
+        before = prepared_statements()
+        for _ in range(3):
+            names = [tag.name for tag in Tag.objects.filter(user=self.user)
+                     .order_by('-name').iterator()]
+            self.assertEqual(names, ['Insurance', 'Car'])
+
+        self.assertEqual(prepared_statements(), before)
+
+    def test_changed_result_type_prepared_again(self):
+        """Test a statement broken by a schema change is replaced"""
+        sql = 'SELECT value FROM prepared_test WHERE value = %s'
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE prepared_test '
+                           '(value integer)')
+            cursor.execute('INSERT INTO prepared_test VALUES (1)')
+            for _ in range(2):
+                cursor.execute(sql, [1])
+            cursor.execute('ALTER TABLE prepared_test '
+                           'ALTER COLUMN value TYPE bigint')
+
+            with self.assertRaises(NotSupportedError), transaction.atomic():
+                cursor.execute(sql, [1])
+            for _ in range(2):
+                cursor.execute(sql, [1])
+                self.assertEqual(cursor.fetchone(), (1,))
+
+        self.assertIn(prepared.statement_name(sql), prepared_statements())
+
+    def test_changed_result_type_falls_back(self):
+        """Test outside a transaction the query runs as plain SQL instead"""
+        sql = 'SELECT value FROM prepared_test WHERE value = %s'
+        autocommit = slow_queries.own_connection(connection)
+        try:
+            with autocommit.cursor() as cursor:
+                cursor.execute('CREATE TEMPORARY TABLE prepared_test '
+                               '(value integer)')
+                cursor.execute('INSERT INTO prepared_test VALUES (1)')
+                for _ in range(2):
+                    cursor.execute(sql, [1])
+                cursor.execute('SELECT count(*) FROM pg_prepared_statements')
+                self.assertEqual(cursor.fetchone(), (1,))
+                cursor.execute('ALTER TABLE prepared_test '
+                               'ALTER COLUMN value TYPE bigint')
+
+                cursor.execute(sql, [1])
+
+                self.assertEqual(cursor.fetchone(), (1,))
+                cursor.execute('SELECT count(*) FROM pg_prepared_statements')
+                self.assertEqual(cursor.fetchone(), (0,))
+        finally:
+            autocommit.close()
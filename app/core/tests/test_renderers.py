@@ -0,0 +1,127 @@
+import gzip
+import io
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from rest_framework.exceptions import ParseError
+
+from core import middleware, renderers
+
+
+class RendererTests(TestCase):
+    """Test the JSON renderer and parser"""
+
+    def test_render_decimal_exactly(self):
+        """Test decimals are rendered as their exact digits"""
+        data = {'price': Decimal('0.10'), 'title': 'line\u2028break'}
+
+        fast = renderers.FastJSONRenderer().render(data)
+        with patch.object(renderers, 'orjson', None):
+            fallback = renderers.FastJSONRenderer().render(data)
+
+        self.assertEqual(fast, b'{"price":"0.10","title":"line\\u2028break"}')
+        self.assertEqual(fallback, fast)
+
+    def test_render_integer_keys(self):
+        """Test dicts with integer keys, such as list errors, render"""
+        data = {'profiles': {0: {'age': ['Too young.']}}}
+
+        self.assertEqual(renderers.FastJSONRenderer().render(data),
+                         b'{"profiles":{"0":{"age":["Too young."]}}}')
+
+    def test_parse_decimal_without_float(self):
+        """Test the stdlib fallback parses numbers to Decimal"""
+        with patch.object(renderers, 'orjson', None):
+            data = renderers.FastJSONParser().parse(
+                io.BytesIO(b'{"price": 19.99}')
+            )
+
+        self.assertEqual(data, {'price': Decimal('19.99')})
+
+    def test_parse_decimal_with_orjson(self):
+        """Test fractional numbers are Decimal whichever parser runs"""
+        body = b'{"price": 0.1000000000000000055511151231257827, "n": 1E2}'
+
+        data = renderers.FastJSONParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data, {
+            'price': Decimal('0.1000000000000000055511151231257827'),
+            'n': Decimal('1E2'),
+        })
+
+    def test_parse_fast(self):
+        """Test the orjson parser reads JSON bodies"""
+        data = renderers.FastJSONParser().parse(
+            io.BytesIO(b'{"title": "auto", "tags": [1, 2]}')
+        )
+
+        self.assertEqual(data, {'title': 'auto', 'tags': [1, 2]})
+
+    def test_msgpack_encoding(self):
+        """Test MessagePack maps decimals and datetimes to strings"""
+        data = {
+            'price': Decimal('19.99'),
+            'created': datetime(2019, 8, 6, 18, 55, tzinfo=timezone.utc),
+        }
+
+        body = renderers.MessagePackRenderer().render(data)
+
+        self.assertEqual(renderers.MessagePackParser().parse(io.BytesIO(body)),
+                         {'price': '19.99', 'created': '2019-08-06T18:55:00Z'})
+
+    def test_msgpack_parse_error(self):
+        """Test invalid MessagePack bodies raise a parse error"""
+        with self.assertRaises(ParseError):
+            renderers.MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(TestCase):
+    """Test response compression"""
+
+    def setUp(self):
+        self.body = b'{"title": "Sample product"}' * 20
+
+    def process(self, accept_encoding, body=None):
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        response = HttpResponse(body or self.body)
+        response['ETag'] = '"abc"'
+        return middleware.CompressionMiddleware().process_response(
+            request, response
+        )
+
+    def test_gzip(self):
+        """Test gzip is used when brotli is not accepted"""
+        response = self.process('gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_brotli_preferred(self):
+        """Test brotli is used when accepted"""
+        response = self.process('gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content),
+                         self.body)
+
+    def test_quality_values_respected(self):
+        """Test encodings refused by the client are not used"""
+        response = self.process('br;q=0, gzip;q=0.5')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_small_responses_not_compressed(self):
+        """Test bodies under the threshold are sent as is"""
+        response = self.process('gzip', body=b'{}')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
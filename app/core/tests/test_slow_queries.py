@@ -0,0 +1,125 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Product, SlowQuery
+
+
+class SlowQueryTests(TestCase):
+    """Test capturing slow queries"""
+
+    def setUp(self):
+        slow_queries.recorder.limiter = slow_queries.RateLimiter()
+        self.user = get_user_model().objects.create_user(
+            '4086432477', 'testpass'
+        )
+
+    def tearDown(self):
+        # Recorded queries are committed outside the test transaction
+        writer = slow_queries.own_connection(connection)
+        with writer.cursor() as cursor:
+            cursor.execute('DELETE FROM core_slowquery')
+        writer.close()
+
+    def test_recorder_installed(self):
+        """Test the recorder wraps the database connection"""
+        self.assertIn(slow_queries.recorder, connection.execute_wrappers)
+
+    def test_fingerprint_normalizes_values(self):
+        """Test queries differing in values share a fingerprint"""
+        first = fingerprint = slow_queries.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a''b'"
+        )
+        second = slow_queries.fingerprint(
+            "SELECT *  FROM t WHERE id IN (%s) AND name = 'c' "
+        )
+
+        self.assertEqual(first, second)
+        self.assertEqual(fingerprint[0],
+                         'SELECT * FROM t WHERE id IN (...) AND name = ?')
+
+    def test_slow_query_recorded_with_plan(self):
+        """Test queries over the threshold are aggregated with a plan"""
+        with override_settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            list(Product.objects.filter(user=self.user))
+            list(Product.objects.filter(user=self.user))
+
+        query = SlowQuery.objects.get(sql__contains='FROM "core_product"')
+        self.assertEqual(query.calls, 2)
+        self.assertIn('Scan', query.plan)
+        self.assertGreaterEqual(query.total_time, query.max_time)
+        self.assertIn('Slow query', logs.output[0])
+
+    def test_slow_query_kept_on_rollback(self):
+        """Test a query is recorded outside the caller's transaction"""
+        with override_settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('core.slow_queries', 'WARNING'), \
+                self.assertRaises(RuntimeError), transaction.atomic():
+            list(Product.objects.filter(user=self.user))
+            raise RuntimeError
+
+        self.assertTrue(SlowQuery.objects.filter(
+            sql__contains='FROM "core_product"'
+        ).exists())
+
+    def test_slow_query_names_view(self):
+        """Test queries run by a view are attributed to it"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with override_settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('core.slow_queries', 'WARNING'):
+            client.get(reverse('product:product-list'))
+
+        query = SlowQuery.objects.filter(sql__contains='FROM "core_product"') \
+            .first()
+        self.assertEqual(query.view, 'GET product:product-list')
+        self.assertEqual(slow_queries.current_view(), '')
+
+    def test_fast_queries_ignored(self):
+        """Test queries under the threshold are not recorded"""
+        with override_settings(SLOW_QUERY_THRESHOLD=60000):
+            list(Product.objects.filter(user=self.user))
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_sampling_and_rate_limit(self):
+        """Test slow queries are sampled and rate limited"""
+        with override_settings(SLOW_QUERY_THRESHOLD=0,
+                               SLOW_QUERY_SAMPLE_RATE=0):
+            list(Product.objects.filter(user=self.user))
+        self.assertFalse(SlowQuery.objects.exists())
+
+        with override_settings(SLOW_QUERY_THRESHOLD=0,
+                               SLOW_QUERY_MAX_PER_MINUTE=1), \
+                self.assertLogs('core.slow_queries', 'WARNING'):
+            list(Product.objects.filter(user=self.user))
+            list(Product.objects.filter(user=self.user))
+        self.assertEqual(SlowQuery.objects.get().calls, 1)
+
+    def test_slow_queries_command(self):
+        """Test the command lists fingerprints, slowest first"""
+        SlowQuery.objects.create(fingerprint='a' * 32, sql='SELECT 1',
+                                 calls=2, total_time=10, max_time=6,
+                                 plan='Result')
+        SlowQuery.objects.create(fingerprint='b' * 32, sql='SELECT 2',
+                                 calls=1, total_time=50, max_time=50)
+        out = StringIO()
+
+        call_command('slow_queries', '--plans', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('b' * 12))
+        self.assertIn('mean 5.0 ms', lines[2])
+        self.assertEqual(lines[4].strip(), 'Result')
+
+        call_command('slow_queries', '--reset', stdout=out)
+        self.assertFalse(SlowQuery.objects.exists())
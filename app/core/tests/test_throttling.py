@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.test import APIRequestFactory
+
+from core.throttling import SlidingWindowThrottle
+
+
+class IPThrottle(SlidingWindowThrottle):
+    rate = '4/min'
+    scope = 'test'
+
+
+def allowed(throttle_class, request, now):
+    """Run one throttle check at a given time"""
+    throttle = throttle_class()
+    with patch.object(throttle, 'timer', return_value=now):
+        return throttle.allow_request(request, None)
+
+
+class SlidingWindowThrottleTests(TestCase):
+    """Test the sliding window throttles"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().get('/')
+
+    def test_limit_within_window(self):
+        """Test requests over the rate are rejected"""
+        results = [allowed(IPThrottle, self.request, 600 + second)
+                   for second in range(5)]
+
+        self.assertEqual(results, [True] * 4 + [False])
+
+    def test_previous_window_weighted(self):
+        """Test the previous window counts for its overlapping share"""
+        for _ in range(4):
+            allowed(IPThrottle, self.request, 659)
+
+        # A quarter into the next window 3/4 of the old requests still count
+        self.assertTrue(allowed(IPThrottle, self.request, 675))
+        self.assertFalse(allowed(IPThrottle, self.request, 675))
+        # Three quarters in, only one old request still counts
+        self.assertTrue(allowed(IPThrottle, self.request, 705))
+
+    def test_one_round_trip_per_check(self):
+        """Test a check within a started window only increments"""
+        allowed(IPThrottle, self.request, 659)
+        allowed(IPThrottle, self.request, 661)
+
+        with patch.object(SlidingWindowThrottle, 'cache') as mock_cache:
+            mock_cache.incr.return_value = (1 << 32) + 2
+            self.assertTrue(allowed(IPThrottle, self.request, 662))
+
+        self.assertEqual(mock_cache.method_calls,
+                         [('incr', ('throttle:test:127.0.0.1:11',), {})])
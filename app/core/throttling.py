@@ -0,0 +1,115 @@
+"""Sliding window throttles built on atomic cache counters.
+
+Each key counts requests in fixed windows of the throttle duration.  A
+request is allowed while the previous window's count, weighted by how much
+of it still overlaps the sliding window, plus the current window's count
+stays within the rate.
+
+The counter of a window starts at the previous window's total shifted
+above COUNT_BITS, so a single atomic cache.incr() returns both counts and
+is the only round-trip of a check.  Only the first request of a window,
+across all processes, also reads the previous window and creates the
+counter.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] by scope.
+"""
+from django.core.cache import cache as default_cache
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+COUNT_BITS = 32
+COUNT_MASK = (1 << COUNT_BITS) - 1
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Base class for sliding window throttles.
+
+    Subclasses set scope and implement get_ident(), returning None when a
+    request should not be throttled.
+    """
+    cache = default_cache
+    cache_format = 'throttle:%(scope)s:%(ident)s:%(window)d'
+
+    def get_rate(self):
+        """Read the rate at call time so settings overrides apply"""
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def get_cache_key(self, request, view, window):
+        ident = self.get_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident,
+            'window': window
+        }
+
+    def count_request(self, key, previous_key):
+        """Atomically count a request in a window.
+
+        Returns the totals of the previous and the current window.
+        """
+        try:
+            value = self.cache.incr(key)
+        except ValueError:
+            previous = self.cache.get(previous_key, 0) & COUNT_MASK
+            value = (previous << COUNT_BITS) + 1
+            if not self.cache.add(key, value, self.duration * 2):
+                value = self.cache.incr(key)
+        return value >> COUNT_BITS, value & COUNT_MASK
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        key = self.get_cache_key(request, view, int(window))
+        if key is None:
+            return True
+
+        previous, count = self.count_request(
+            key, self.get_cache_key(request, view, int(window) - 1)
+        )
+        self.remaining = self.duration - offset
+        estimate = previous * (self.remaining / self.duration) + count
+        return estimate <= self.num_requests
+
+    def wait(self):
+        return self.remaining
+
+
+class PhoneNumberThrottle(SlidingWindowThrottle):
+    """Limit login attempts per phone number"""
+    scope = 'login'
+
+    def get_ident(self, request):
+        phone_number = request.data.get('phone_number')
+        if not phone_number:
+            return None
+        return ''.join(char for char in str(phone_number) if char.isdigit())
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    """Limit login attempts per client address"""
+    scope = 'login_ip'
+
+
+class SignupIPThrottle(SlidingWindowThrottle):
+    """Limit account creation per client address"""
+    scope = 'signup'
+
+
+class ProductWriteThrottle(SlidingWindowThrottle):
+    """Limit product writes per authenticated user"""
+    scope = 'product_write'
+
+    def get_ident(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        if request.user and request.user.is_authenticated:
+            return 'user-%s' % request.user.pk
+        return super().get_ident(request)
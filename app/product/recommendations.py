@@ -0,0 +1,139 @@
+"""Product recommendations for a user's weakest scores.
+
+Recommended products come from the catalog, the products of the account
+whose phone number is RECOMMENDATION_CATALOG_USER; other users' products
+are never shown.  RECOMMENDATION_TAGS maps each sub-score to the names of
+catalog tags addressing it.  Products are ranked by how weak the
+sub-scores their tags address are.
+
+Each worker holds an inverted index of lowercased tag name to catalog
+product ids, along with the products themselves, so a request reads
+nothing but the user's score.  The index is rebuilt once it is
+RECOMMENDATION_INDEX_MAX_AGE seconds old, or when the catalog changed as
+tracked by the catalog user's version in product.summary.  One thread
+builds the new index while the others keep serving the old one, which is
+then swapped out in one assignment.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core.models import Product, Score
+
+from product import summary
+
+
+WEAKEST = 3
+LIMIT = 20
+
+_index = None
+_lock = threading.Lock()
+
+
+class RecommendationIndex:
+    """Catalog products and the ids of those carrying each tag name"""
+
+    def __init__(self, catalog_id=None, version=None, products=()):
+        self.catalog_id = catalog_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.products = {}
+        tags = defaultdict(list)
+        for product in products:
+            names = sorted(tag.name for tag in product.tags.all())
+            self.products[product.id] = {
+                'id': product.id,
+                'title': product.title,
+                'price': product.price,
+                'link': product.link,
+                'tags': names,
+            }
+            for name in names:
+                tags[name.lower()].append(product.id)
+        self.tags = {name: tuple(ids) for name, ids in tags.items()}
+
+    def stale(self):
+        max_age = getattr(settings, 'RECOMMENDATION_INDEX_MAX_AGE', 300)
+        if time.monotonic() - self.built_at >= max_age:
+            return True
+        return self.catalog_id is not None and \
+            summary.version(self.catalog_id) != self.version
+
+    def recommend(self, scores, limit=LIMIT):
+        """Return catalog products for the weakest sub-scores, best first.
+
+        scores maps sub-score names to values, which may be None.
+        """
+        mapping = getattr(settings, 'RECOMMENDATION_TAGS', {})
+        weakest = sorted(
+            (value, metric) for metric, value in scores.items()
+            if value is not None and value < Score.MAX_Score and
+            metric in mapping
+        )[:WEAKEST]
+        ranks = defaultdict(int)
+        matches = defaultdict(list)
+        for value, metric in weakest:
+            product_ids = {product_id for name in mapping[metric]
+                           for product_id in self.tags.get(name.lower(), ())}
+            for product_id in product_ids:
+                ranks[product_id] += Score.MAX_Score - value
+                matches[product_id].append(metric)
+        ranked = sorted(ranks, key=lambda product_id: (-ranks[product_id],
+                                                       product_id))
+        return {
+            'weakest': [{'metric': metric, 'value': value}
+                        for value, metric in weakest],
+            'products': [dict(self.products[product_id],
+                              matches=matches[product_id])
+                         for product_id in ranked[:limit]],
+        }
+
+
+def build():
+    """Return a new index of the catalog"""
+    phone_number = getattr(settings, 'RECOMMENDATION_CATALOG_USER', None)
+    catalog_id = get_user_model().objects.filter(
+        phone_number=phone_number
+    ).values_list('id', flat=True).first() if phone_number else None
+    if catalog_id is None:
+        return RecommendationIndex()
+    # Read the version first, so changes made while building make the new
+    # index stale right away
+    version = summary.version(catalog_id)
+    products = Product.objects.filter(user_id=catalog_id) \
+        .prefetch_tags(catalog_id).order_by('id')
+    return RecommendationIndex(catalog_id, version, products)
+
+
+def get_index():
+    """Return the index of this worker, rebuilding it when stale"""
+    global _index
+    index = _index
+    if index is not None and not index.stale():
+        return index
+    if not _lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is index:
+            _index = build()
+        return _index
+    finally:
+        _lock.release()
+
+
+def recommend(user, limit=LIMIT):
+    """Return recommended catalog products for a user's final score"""
+    score = user.scores_final
+    scores = {metric: getattr(score, metric, None)
+              for metric in getattr(settings, 'RECOMMENDATION_TAGS', {})}
+    index = get_index()
+    return dict(index.recommend(scores, limit), version=index.version)
+
+
+def reset():
+    """Forget the index so the next request builds it again"""
+    global _index
+    _index = None
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from core.models import Tag, Product
+from core.sparse_fields import SparseFieldsSerializerMixin
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -12,9 +13,30 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class TagStatsSerializer(serializers.ModelSerializer):
+    """Serializer for tags with the number of products using them"""
+
+    class Meta:
+        model = Tag
+        fields = ('id', 'name', 'product_count')
+        read_only_fields = fields
+
+
+class UserTagField(serializers.PrimaryKeyRelatedField):
+    """Tag ids, looked up among the requesting user's tags only"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+
+class ProductSerializer(SparseFieldsSerializerMixin,
+                        serializers.ModelSerializer):
     """Serializer for Product objects"""
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserTagField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -28,3 +50,35 @@ class ProductSerializer(serializers.ModelSerializer):
 class ProductDetailSerializer(ProductSerializer):
     """Serializer for Product details"""
     tags = TagSerializer(many=True, read_only=True)
+
+
+class TagDeltaSerializer(serializers.Serializer):
+    """Serializer for tags to add to or remove from a product"""
+    max_ids = 1000
+    tags = serializers.ListField(child=serializers.IntegerField(),
+                                 allow_empty=False, max_length=max_ids)
+
+    def _check_owned(self, model, ids):
+        """Reject ids which are not objects of the requesting user"""
+        ids = set(ids)
+        owned = set(model.objects.filter(
+            user=self.context['request'].user, pk__in=ids
+        ).values_list('pk', flat=True))
+        if ids - owned:
+            raise serializers.ValidationError('Unknown ids: %s' % ', '.join(
+                str(pk) for pk in sorted(ids - owned)
+            ))
+        return sorted(ids)
+
+    def validate_tags(self, value):
+        return self._check_owned(Tag, value)
+
+
+class BulkTagDeltaSerializer(TagDeltaSerializer):
+    """Serializer for tags to add to or remove from many products"""
+    products = serializers.ListField(child=serializers.IntegerField(),
+                                     allow_empty=False,
+                                     max_length=TagDeltaSerializer.max_ids)
+
+    def validate_products(self, value):
+        return self._check_owned(Product, value)
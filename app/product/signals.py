@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Product
+
+from product import summary
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_summary(sender, instance, **kwargs):
+    """Drop the price summary of the owner of a changed product or tag"""
+    summary.invalidate(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def invalidate_summary_on_links(sender, instance, action, **kwargs):
+    """Drop the price summary when product tags change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        summary.invalidate(instance.user_id)
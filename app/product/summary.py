@@ -0,0 +1,90 @@
+"""Per-user price totals of products, overall and by tag.
+
+Summaries are cached per user under a versioned key.  invalidate() bumps
+the version right away and again when the transaction commits, so a
+summary computed from data read before the commit is stored under a
+version nobody reads any more.  product.signals invalidates on ORM writes
+to products, tags and their links, and product.tagging on its own writes.
+Across processes this needs a shared cache such as memcached.
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+CACHE_TIMEOUT = 60 * 60
+
+SUMMARY_SQL = """
+SELECT NULL, NULL, SUM(price), COUNT(*) FROM core_product
+WHERE user_id = %(user)s
+UNION ALL
+SELECT t.id, t.name, SUM(p.price), COUNT(*)
+FROM core_product p
+JOIN core_product_tags pt ON pt.product_id = p.id
+JOIN core_tag t ON t.id = pt.tag_id AND t.user_id = %(user)s
+WHERE p.user_id = %(user)s
+GROUP BY t.id, t.name
+"""
+
+
+def compute(user_id):
+    """Return the totals of a user's products in one query"""
+    with connection.cursor() as cursor:
+        cursor.execute(SUMMARY_SQL, {'user': user_id})
+        rows = cursor.fetchall()
+    # UNION ALL does not keep the order of its branches; only the overall
+    # row has no tag id
+    total, count = next(row[2:] for row in rows if row[0] is None)
+    tags = [row for row in rows if row[0] is not None]
+    return {
+        'total': total or Decimal('0.00'),
+        'count': count,
+        'tags': [
+            {'id': tag_id, 'name': name, 'total': tag_total, 'count': tagged}
+            for tag_id, name, tag_total, tagged in sorted(
+                tags, key=lambda row: (-row[2], row[1], row[0])
+            )
+        ],
+    }
+
+
+def _version_key(user_id):
+    return 'product-summary-version:%d' % user_id
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        pass
+
+
+def version(user_id):
+    """Return the current summary version of a user"""
+    key = _version_key(user_id)
+    current = cache.get(key)
+    if current is None:
+        # Start from the clock so summaries cached under versions of an
+        # evicted counter are not picked up again
+        cache.add(key, time.time_ns(), None)
+        current = cache.get(key)
+    return current
+
+
+def get(user_id):
+    """Return the summary of a user, from the cache when possible"""
+    key = 'product-summary:%d:%s' % (user_id, version(user_id))
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute(user_id)
+        cache.set(key, summary, CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate(user_id):
+    """Drop the cached summary of a user, now and after commit"""
+    _bump(user_id)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_id))
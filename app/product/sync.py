@@ -0,0 +1,100 @@
+"""Delta sync of a user's products and tags.
+
+Database triggers stamp every insert or update of a product or tag with
+the id of the writing transaction and a number from a global sequence, and
+record deletions as core.Tombstone rows stamped the same way.  Changes are
+read in (transaction, sequence) order.
+
+Sequence numbers alone would not do: they are drawn before commit, so a
+slow transaction can commit a number lower than one a client has already
+seen.  Instead only changes of transactions older than the snapshot xmin,
+all of which have ended, are returned.  Transactions still running get
+higher ids than any returned, so they are picked up by the next sync.
+
+The cursor handed to clients is the position of the last change returned.
+"""
+import base64
+
+from django.db import connection
+from django.db.models import Q
+
+from core.models import Tag, Product, Tombstone
+
+
+def encode_cursor(position):
+    """Return the opaque cursor of a (txid, seq) position"""
+    return base64.urlsafe_b64encode(
+        ('%d.%d' % position).encode()
+    ).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (txid, seq) position of a cursor, or raise ValueError"""
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        txid, seq = value.decode().split('.')
+        position = int(txid), int(seq)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if min(position) < 0:
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def horizon():
+    """Return the snapshot xmin and the current transaction id, if any.
+
+    A transaction sees its own writes, so they are included as well;
+    sync requests themselves never write.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot()), '
+                       'txid_current_if_assigned()')
+        return cursor.fetchone()
+
+
+def _after(queryset, position, xmin, own, limit):
+    """Return up to limit + 1 visible rows changed after a position"""
+    txid, seq = position
+    visible = Q(change_txid__lt=xmin)
+    if own is not None:
+        visible |= Q(change_txid=own)
+    return list(
+        queryset.filter(visible)
+        .filter(Q(change_txid__gt=txid) |
+                Q(change_txid=txid, change_seq__gt=seq))
+        .order_by('change_txid', 'change_seq')[:limit + 1]
+    )
+
+
+def changes(user, position=(0, 0), limit=500):
+    """Return the next changes of a user after a position.
+
+    The result holds changed products and tags, the ids of deleted ones,
+    the position of the last change returned and whether more follow.
+    """
+    xmin, own = horizon()
+    sources = (
+        _after(Product.objects.filter(user=user).prefetch_tags(user),
+               position, xmin, own, limit),
+        _after(Tag.objects.filter(user=user), position, xmin, own, limit),
+        _after(Tombstone.objects.filter(user=user), position, xmin, own,
+               limit),
+    )
+    rows = sorted((row for source in sources for row in source),
+                  key=lambda row: (row.change_txid, row.change_seq))
+    page = rows[:limit]
+    if page:
+        position = page[-1].change_txid, page[-1].change_seq
+
+    return {
+        'products': [row for row in page if isinstance(row, Product)],
+        'tags': [row for row in page if isinstance(row, Tag)],
+        'deleted': {
+            kind + 's': [row.object_id for row in page
+                         if isinstance(row, Tombstone) and row.kind == kind]
+            for kind in (Tombstone.PRODUCT, Tombstone.TAG)
+        },
+        'position': position,
+        'has_more': len(rows) > limit,
+    }
@@ -0,0 +1,75 @@
+"""Add and remove product tags by delta.
+
+Each change is one statement: the links are inserted or deleted in a data
+modifying CTE whose returned rows drive the Tag.product_count and
+Product.updated_at updates core.signals applies to ORM changes, so only
+links which actually changed are counted.  Cached price summaries of the
+user are invalidated and its dashboard refreshed too.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from product import summary
+
+from user import dashboard
+
+
+ADD_SQL = """
+WITH changed AS (
+    INSERT INTO core_product_tags (product_id, tag_id)
+    SELECT p.id, t.id FROM core_product p, core_tag t
+    WHERE p.id = ANY(%(products)s) AND p.user_id = %(user)s
+        AND t.id = ANY(%(tags)s) AND t.user_id = %(user)s
+    ON CONFLICT (product_id, tag_id) DO NOTHING
+    RETURNING product_id, tag_id
+), {bookkeeping}
+"""
+
+REMOVE_SQL = """
+WITH changed AS (
+    DELETE FROM core_product_tags pt USING core_product p
+    WHERE pt.product_id = p.id AND p.user_id = %(user)s
+        AND pt.product_id = ANY(%(products)s)
+        AND pt.tag_id = ANY(%(tags)s)
+    RETURNING pt.product_id, pt.tag_id
+), {bookkeeping}
+"""
+
+BOOKKEEPING_SQL = """
+counted AS (
+    UPDATE core_tag t SET product_count = t.product_count {sign} c.links
+    FROM (SELECT tag_id, count(*) AS links FROM changed GROUP BY tag_id) c
+    WHERE t.id = c.tag_id
+), touched AS (
+    UPDATE core_product p SET updated_at = %(now)s
+    WHERE p.id IN (SELECT product_id FROM changed)
+)
+SELECT count(*) FROM changed
+"""
+
+
+def _apply(sql, sign, user, product_ids, tag_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            bookkeeping=BOOKKEEPING_SQL.format(sign=sign)
+        ), {
+            'user': user.pk,
+            'products': list(product_ids),
+            'tags': list(tag_ids),
+            'now': timezone.now(),
+        })
+        count = cursor.fetchone()[0]
+    if count:
+        summary.invalidate(user.pk)
+        dashboard.refresh(user.pk, 'tags', 'products')
+    return count
+
+
+def add_tags(user, product_ids, tag_ids):
+    """Link the user's tags to the user's products, return links added"""
+    return _apply(ADD_SQL, '+', user, product_ids, tag_ids)
+
+
+def remove_tags(user, product_ids, tag_ids):
+    """Unlink tags from the user's products, return links removed"""
+    return _apply(REMOVE_SQL, '-', user, product_ids, tag_ids)
@@ -1,16 +1,29 @@
+from decimal import Decimal
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Product, Tag
+import msgpack
+
+from core.models import Product, Score, Tag
 
+from product import recommendations, summary
 from product.serializers import ProductSerializer, ProductDetailSerializer
 
 
 PRODUCTS_URL = reverse('product:product-list')
+BULK_ADD_TAGS_URL = reverse('product:product-bulk-add-tags')
+BULK_REMOVE_TAGS_URL = reverse('product:product-bulk-remove-tags')
+SUMMARY_URL = reverse('product:product-summary')
+RECOMMENDATIONS_URL = reverse('product:product-recommendations')
 
 
 def detail_url(product_id):
@@ -18,6 +31,11 @@ def detail_url(product_id):
     return reverse('product:product-detail', args=[product_id])
 
 
+def tags_url(product_id, change):
+    """Return the URL adding or removing tags of a product"""
+    return reverse('product:product-%s-tags' % change, args=[product_id])
+
+
 def sample_tag(user, name='Sample tag'):
     """Create and reutn a sample tag"""
     return Tag.objects.create(user=user, name=name)
@@ -57,6 +75,7 @@ class PrivateProductApiTests(TestCase):
             'testpass'
         )
         self.client.force_authenticate(self.user)
+        cache.clear()
 
     def test_retrieve_products(self):
         """Test retrieving a list of products"""
@@ -128,6 +147,16 @@ class PrivateProductApiTests(TestCase):
         self.assertIn(tag1, tags)
         self.assertIn(tag2, tags)
 
+    def test_create_product_with_other_users_tag(self):
+        """Test that tags of other users cannot be attached"""
+        user2 = get_user_model().objects.create_user('4086432478', 'pass')
+        tag = sample_tag(user=user2)
+        payload = {'title': 'Insurance', 'tags': [tag.id], 'price': 20.00}
+
+        res = self.client.post(PRODUCTS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_partial_update_product(self):
         """Test updating a product with patch"""
         product = sample_product(user=self.user)
@@ -185,3 +214,452 @@ class PrivateProductApiTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {
+        'login': '100/min', 'login_ip': '100/min', 'signup': '100/min',
+        'product_write': '1/min'}})
+    def test_product_writes_throttled(self):
+        """Test that product writes are throttled but reads are not"""
+        payload = {'title': 'This product', 'price': 5.00}
+        self.client.post(PRODUCTS_URL, payload)
+
+        res = self.client.post(PRODUCTS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(PRODUCTS_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_retrieve_products_msgpack(self):
+        """Test products can be negotiated as MessagePack"""
+        product = sample_product(user=self.user, price=19.99)
+
+        res = self.client.get(PRODUCTS_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(res.content, raw=False)
+        self.assertEqual(data[0]['id'], product.id)
+        self.assertEqual(data[0]['price'], '19.99')
+
+    def test_create_product_msgpack(self):
+        """Test creating a product from a MessagePack body"""
+        tag = sample_tag(user=self.user)
+        payload = {'title': 'auto', 'price': '5.25', 'tags': [tag.id]}
+
+        res = self.client.post(PRODUCTS_URL, msgpack.packb(payload),
+                               content_type='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        product = Product.objects.get(id=res.data['id'])
+        self.assertEqual(str(product.price), '5.25')
+        self.assertEqual(list(product.tags.all()), [tag])
+
+    def test_json_is_default(self):
+        """Test JSON stays the default representation"""
+        res = self.client.get(PRODUCTS_URL)
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+
+    def test_sparse_fields(self):
+        """Test ?fields= limits the fields and skips the tags query"""
+        product = sample_product(user=self.user, title='auto')
+        product.tags.add(sample_tag(user=self.user))
+
+        # One query for the ETag version, one for the products
+        with self.assertNumQueries(2):
+            res = self.client.get(PRODUCTS_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': product.id, 'title': 'auto'}])
+
+    def test_sparse_fields_with_tags(self):
+        """Test requested tags are prefetched in one query"""
+        for title in ('auto', 'home'):
+            product = sample_product(user=self.user, title=title)
+            product.tags.add(sample_tag(user=self.user))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(PRODUCTS_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(set(res.data[0]), {'title', 'tags'})
+        self.assertEqual(len(res.data[0]['tags']), 1)
+
+    def test_tags_read_by_user(self):
+        """Test product tag reads filter by user, reading one partition"""
+        product = sample_product(user=self.user)
+        product.tags.add(sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(PRODUCTS_URL)
+            self.client.get(detail_url(product.id))
+
+        tag_queries = [query['sql'] for query in queries
+                       if 'FROM "core_tag"' in query['sql']]
+        self.assertEqual(len(tag_queries), 3)
+        for sql in tag_queries:
+            self.assertIn('"user_id" = %d' % self.user.id, sql)
+
+    def test_sparse_fields_unknown(self):
+        """Test unknown fields are rejected"""
+        res = self.client.get(PRODUCTS_URL, {'fields': 'id,owner'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_list_not_modified(self):
+        """Test an unchanged product list answers 304 to its ETag"""
+        product = sample_product(user=self.user)
+        res = self.client.get(PRODUCTS_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        product.tags.add(sample_tag(user=self.user))
+        res = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_product_list_etag_changes_on_delete(self):
+        """Test deleting a product invalidates the list ETag"""
+        sample_product(user=self.user)
+        product = sample_product(user=self.user)
+        etag = self.client.get(PRODUCTS_URL)['ETag']
+
+        product.delete()
+
+        res = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_product_detail_not_modified_since(self):
+        """Test product detail honours If-Modified-Since"""
+        product = sample_product(user=self.user)
+        res = self.client.get(detail_url(product.id))
+
+        res = self.client.get(detail_url(product.id),
+                              HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ProductTagDeltaApiTests(TestCase):
+    """Test adding and removing product tags by delta"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            '4086432477',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        self.tag1 = sample_tag(user=self.user, name='Insurance')
+        self.tag2 = sample_tag(user=self.user, name='Warranty')
+        self.product = sample_product(user=self.user)
+        self.product.tags.add(self.tag1)
+
+    def test_add_tags(self):
+        """Test adding tags keeps existing ones and counts new links only"""
+        updated_at = self.product.updated_at
+
+        # The change itself takes three, refreshing the dashboard five
+        with self.assertNumQueries(8):
+            res = self.client.post(tags_url(self.product.id, 'add'),
+                                   {'tags': [self.tag1.id, self.tag2.id]})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'added': 1})
+        self.assertEqual(set(self.product.tags.all()), {self.tag1, self.tag2})
+        self.tag1.refresh_from_db()
+        self.tag2.refresh_from_db()
+        self.assertEqual(self.tag1.product_count, 1)
+        self.assertEqual(self.tag2.product_count, 1)
+        self.product.refresh_from_db()
+        self.assertGreater(self.product.updated_at, updated_at)
+
+    def test_remove_tags(self):
+        """Test removing tags only touches the given links"""
+        self.product.tags.add(self.tag2)
+
+        res = self.client.post(tags_url(self.product.id, 'remove'),
+                               {'tags': [self.tag1.id]})
+
+        self.assertEqual(res.data, {'removed': 1})
+        self.assertEqual(list(self.product.tags.all()), [self.tag2])
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.product_count, 0)
+
+    def test_bulk_add_and_remove_tags(self):
+        """Test changing tags of many products at once"""
+        product2 = sample_product(user=self.user)
+        payload = {'products': [self.product.id, product2.id],
+                   'tags': [self.tag1.id, self.tag2.id]}
+
+        res = self.client.post(BULK_ADD_TAGS_URL, payload)
+
+        self.assertEqual(res.data, {'added': 3})
+        self.assertEqual(product2.tags.count(), 2)
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.product_count, 2)
+
+        res = self.client.post(BULK_REMOVE_TAGS_URL, payload)
+
+        self.assertEqual(res.data, {'removed': 4})
+        self.assertEqual(Tag.objects.filter(product_count=0).count(), 2)
+
+    def test_tags_of_other_users_rejected(self):
+        """Test that tags and products of other users are not accepted"""
+        user2 = get_user_model().objects.create_user('4086432478', 'pass')
+        tag = sample_tag(user=user2)
+        product = sample_product(user=user2)
+
+        res = self.client.post(tags_url(self.product.id, 'add'),
+                               {'tags': [tag.id]})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(tags_url(product.id, 'add'),
+                               {'tags': [self.tag2.id]})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.post(BULK_ADD_TAGS_URL, {
+            'products': [product.id], 'tags': [self.tag2.id]
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(product.tags.count(), 0)
+
+
+class ProductSummaryApiTests(TestCase):
+    """Test the per-user product price summary"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            '4086432477',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        self.tag1 = sample_tag(user=self.user, name='Insurance')
+        self.tag2 = sample_tag(user=self.user, name='Warranty')
+        self.product1 = sample_product(user=self.user, price='0.10')
+        self.product2 = sample_product(user=self.user, price='0.20')
+        self.product1.tags.add(self.tag1, self.tag2)
+        self.product2.tags.add(self.tag1)
+
+    def test_summary_totals(self):
+        """Test totals are exact, overall and by tag"""
+        other = get_user_model().objects.create_user('4086432478', 'pass')
+        sample_product(user=other, price='5.00')
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {
+            'total': '0.30',
+            'count': 2,
+            'tags': [
+                {'id': self.tag1.id, 'name': 'Insurance', 'total': '0.30',
+                 'count': 2},
+                {'id': self.tag2.id, 'name': 'Warranty', 'total': '0.10',
+                 'count': 1},
+            ],
+        })
+
+    def test_summary_rows_in_any_order(self):
+        """Test the overall row is found wherever the database returns it"""
+        overall, by_tag = summary.SUMMARY_SQL.split('UNION ALL')
+
+        with patch.object(summary, 'SUMMARY_SQL',
+                          by_tag + 'UNION ALL' + overall):
+            result = summary.compute(self.user.id)
+
+        self.assertEqual(result['total'], Decimal('0.30'))
+        self.assertEqual(result['count'], 2)
+        self.assertEqual([tag['id'] for tag in result['tags']],
+                         [self.tag1.id, self.tag2.id])
+
+    def test_summary_empty(self):
+        """Test users without products get zero totals"""
+        self.client.force_authenticate(
+            get_user_model().objects.create_user('4086432478', 'pass')
+        )
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.json(), {'total': '0.00', 'count': 0,
+                                      'tags': []})
+
+    def test_summary_cached(self):
+        """Test the summary is served from the cache until a write"""
+        self.client.get(SUMMARY_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(SUMMARY_URL)
+
+    def test_summary_invalidated_by_writes(self):
+        """Test product, link and tag writes refresh the summary"""
+        self.client.get(SUMMARY_URL)
+
+        self.product1.price = '1.10'
+        self.product1.save()
+        self.assertEqual(self.client.get(SUMMARY_URL).json()['total'], '1.30')
+
+        self.product2.tags.remove(self.tag1)
+        tags = self.client.get(SUMMARY_URL).json()['tags']
+        self.assertEqual(tags[0]['count'], 1)
+
+        self.client.post(tags_url(self.product2.id, 'add'),
+                         {'tags': [self.tag2.id]})
+        tags = self.client.get(SUMMARY_URL).json()['tags']
+        self.assertEqual([tag['count'] for tag in tags], [2, 1])
+
+        self.product2.delete()
+        self.assertEqual(self.client.get(SUMMARY_URL).json()['count'], 1)
+
+
+class ProductIdempotencyApiTests(TestCase):
+    """Test replaying product creates with an Idempotency-Key"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            '4086432477',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        self.payload = {'title': 'Car', 'price': '5.00'}
+
+    def test_retry_replays_response(self):
+        """Test a retried create returns the first response unchanged"""
+        res1 = self.client.post(PRODUCTS_URL, self.payload,
+                                HTTP_IDEMPOTENCY_KEY='abc')
+        with self.assertNumQueries(0):
+            res2 = self.client.post(PRODUCTS_URL, self.payload,
+                                    HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.content, res1.content)
+        self.assertEqual(res2['Content-Type'], res1['Content-Type'])
+        self.assertEqual(res2['Idempotent-Replayed'], 'true')
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        """Test another user's key does not replay"""
+        self.client.post(PRODUCTS_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='abc')
+        other = get_user_model().objects.create_user('4086432478', 'testpass')
+        self.client.force_authenticate(other)
+
+        res = self.client.post(PRODUCTS_URL, self.payload,
+                               HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_key_reused_with_other_body(self):
+        """Test reusing a key for a different request is refused"""
+        self.client.post(PRODUCTS_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='abc')
+
+        res = self.client.post(PRODUCTS_URL, {'title': 'Bike', 'price': 1},
+                               HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Product.objects.count(), 1)
+
+    @patch('core.idempotency.IdempotentCreateMixin.idempotency_lock_wait', 0)
+    def test_concurrent_duplicate_conflicts(self):
+        """Test a duplicate of an unfinished request gets a conflict"""
+        add = cache.add
+        with patch('core.idempotency.cache.add',
+                   side_effect=lambda key, *args: (not key.endswith(':lock')
+                                                   and add(key, *args))):
+            res = self.client.post(PRODUCTS_URL, self.payload,
+                                   HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Product.objects.exists())
+
+    def test_without_key_creates_again(self):
+        """Test creates without a key are not deduplicated"""
+        self.client.post(PRODUCTS_URL, self.payload)
+        self.client.post(PRODUCTS_URL, self.payload)
+
+        self.assertEqual(Product.objects.count(), 2)
+
+
+@override_settings(RECOMMENDATION_CATALOG_USER='4086432400')
+class ProductRecommendationApiTests(TestCase):
+    """Test recommending catalog products for weak scores"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        recommendations.reset()
+        self.catalog = get_user_model().objects.create_user(
+            '4086432400', 'testpass'
+        )
+        health = sample_tag(self.catalog, 'Health')
+        digital = sample_tag(self.catalog, 'digital')
+        self.checkup = sample_product(self.catalog, title='Checkup')
+        self.checkup.tags.add(health)
+        self.vpn = sample_product(self.catalog, title='VPN')
+        self.vpn.tags.add(digital)
+        self.bundle = sample_product(self.catalog, title='Bundle')
+        self.bundle.tags.add(health, digital)
+        sample_product(self.catalog, title='Untagged')
+
+        self.user = get_user_model().objects.create_user(
+            '4086432477', 'testpass', scores_final=Score.objects.create(
+                score_overall=50, score_medical=10, score_income=90,
+                score_stuff=95, score_liability=100, score_digital=60
+            )
+        )
+        private = sample_product(self.user, title='Private')
+        private.tags.add(sample_tag(self.user, 'Health'))
+        self.client.force_authenticate(self.user)
+
+    def titles(self, res):
+        return [product['title'] for product in res.data['products']]
+
+    def test_recommendations_ranked_by_weakest_scores(self):
+        """Test products for the weakest scores come first"""
+        res = self.client.get(RECOMMENDATIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['metric'] for item in res.data['weakest']],
+            ['score_medical', 'score_digital', 'score_income']
+        )
+        self.assertEqual(self.titles(res), ['Bundle', 'Checkup', 'VPN'])
+        bundle = res.data['products'][0]
+        self.assertEqual(bundle['matches'], ['score_medical',
+                                             'score_digital'])
+        self.assertEqual(bundle['tags'], ['Health', 'digital'])
+
+    def test_recommendations_served_from_memory(self):
+        """Test a built index answers without reading products"""
+        self.client.get(RECOMMENDATIONS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECOMMENDATIONS_URL)
+
+        self.assertEqual(len(res.data['products']), 3)
+
+    def test_catalog_change_rebuilds_index(self):
+        """Test a changed catalog is picked up by a new index"""
+        version = self.client.get(RECOMMENDATIONS_URL).data['version']
+
+        self.vpn.delete()
+        res = self.client.get(RECOMMENDATIONS_URL)
+
+        self.assertNotEqual(res.data['version'], version)
+        self.assertEqual(self.titles(res), ['Bundle', 'Checkup'])
+
+    @override_settings(RECOMMENDATION_CATALOG_USER=None)
+    def test_no_catalog(self):
+        """Test nothing is recommended without a catalog"""
+        res = self.client.get(RECOMMENDATIONS_URL)
+
+        self.assertEqual(res.data['products'], [])
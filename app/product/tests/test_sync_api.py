@@ -0,0 +1,160 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Product
+
+from product import sync
+
+
+SYNC_URL = reverse('product:sync')
+
+
+def sample_product(user, **params):
+    """Create and return a sample product"""
+    defaults = {
+        'title': 'Sample product',
+        'price': 100.00
+    }
+    defaults.update(params)
+
+    return Product.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated sync API access"""
+
+    def test_login_required(self):
+        """Test that login is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test the authorized user sync API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            '4086432477',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_initial_sync_returns_everything(self):
+        """Test that syncing without a cursor returns all rows of the user"""
+        tag = Tag.objects.create(user=self.user, name='insurance')
+        product = sample_product(self.user)
+        product.tags.add(tag)
+        other = get_user_model().objects.create_user('4086432478', 'pass')
+        sample_product(other)
+
+        data = self.sync()
+
+        self.assertEqual([p['id'] for p in data['products']], [product.id])
+        self.assertEqual(data['products'][0]['tags'], [tag.id])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertEqual(data['deleted'], {'products': [], 'tags': []})
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.sync(data['cursor'])['products'], [])
+
+    def test_sync_returns_changes_after_cursor(self):
+        """Test that only rows changed after the cursor are returned"""
+        tag = Tag.objects.create(user=self.user, name='insurance')
+        product = sample_product(self.user)
+        unchanged = sample_product(self.user, title='Unchanged')
+        cursor = self.sync()['cursor']
+
+        product.title = 'Renamed'
+        product.save()
+        new_tag = Tag.objects.create(user=self.user, name='warranty')
+        data = self.sync(cursor)
+
+        self.assertEqual([p['title'] for p in data['products']], ['Renamed'])
+        self.assertEqual([t['id'] for t in data['tags']], [new_tag.id])
+        self.assertNotIn(unchanged.id, [p['id'] for p in data['products']])
+        self.assertNotIn(tag.id, [t['id'] for t in data['tags']])
+
+    def test_sync_returns_products_with_changed_tags(self):
+        """Test that adding a tag to a product resends the product only"""
+        tag = Tag.objects.create(user=self.user, name='insurance')
+        product = sample_product(self.user)
+        cursor = self.sync()['cursor']
+
+        product.tags.add(tag)
+        data = self.sync(cursor)
+
+        self.assertEqual([p['id'] for p in data['products']], [product.id])
+        self.assertEqual(data['tags'], [])
+
+    def test_sync_returns_tombstones(self):
+        """Test that deletions are returned as ids"""
+        tag = Tag.objects.create(user=self.user, name='insurance')
+        product = sample_product(self.user)
+        product_id, tag_id = product.id, tag.id
+        cursor = self.sync()['cursor']
+
+        product.delete()
+        tag.delete()
+        data = self.sync(cursor)
+
+        self.assertEqual(data['products'], [])
+        self.assertEqual(data['deleted'],
+                         {'products': [product_id], 'tags': [tag_id]})
+
+    def test_sync_pages_with_limit(self):
+        """Test that changes are paged in order when over the limit"""
+        products = [sample_product(self.user, title=str(i))
+                    for i in range(3)]
+
+        first = self.sync(limit=2)
+        second = self.sync(first['cursor'], limit=2)
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [p['id'] for p in first['products'] + second['products']],
+            [product.id for product in products]
+        )
+
+    def test_sync_skips_transactions_in_progress(self):
+        """Test that writes of transactions above the horizon are held back"""
+        sample_product(self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+            txid = cursor.fetchone()[0]
+
+        with patch('product.sync.horizon', return_value=(txid, None)):
+            data = self.sync()
+
+        self.assertEqual(data['products'], [])
+        self.assertEqual(sync.decode_cursor(data['cursor']), (0, 0))
+
+    def test_invalid_parameters(self):
+        """Test that bad cursors and limits are rejected"""
+        for params in ({'since': '!!'}, {'since': 'bm9wZQ'},
+                       {'limit': 0}, {'limit': 'x'}):
+            res = self.client.get(SYNC_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the position they encode"""
+        position = (2 ** 40, 12345)
+
+        self.assertEqual(sync.decode_cursor(sync.encode_cursor(position)),
+                         position)
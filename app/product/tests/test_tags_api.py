@@ -5,12 +5,13 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Product
 
 from product.serializers import TagSerializer
 
 
 TAGS_URL = reverse('product:tag-list')
+TAG_STATS_URL = reverse('product:tag-stats')
 
 
 class PublicTagsApiTests(TestCase):
@@ -81,3 +82,36 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_stats_sorted_by_product_count(self):
+        """Test tag stats are returned with counts, most used first"""
+        tag1 = Tag.objects.create(user=self.user, name='insurance')
+        tag2 = Tag.objects.create(user=self.user, name='warranty')
+        for title in ('car', 'phone'):
+            product = Product.objects.create(
+                user=self.user, title=title, price=10.00
+            )
+            product.tags.add(tag2)
+        product.tags.add(tag1)
+
+        res = self.client.get(TAG_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(t['name'], t['product_count']) for t in res.data],
+            [('warranty', 2), ('insurance', 1)]
+        )
+
+    def test_tag_stats_limited_to_user(self):
+        """Test that tag stats only include the user's own tags"""
+        user2 = get_user_model().objects.create_user(
+            '4086432478',
+            'testpass'
+        )
+        Tag.objects.create(user=user2, name='insurance')
+        Tag.objects.create(user=self.user, name='warranty')
+
+        res = self.client.get(TAG_STATS_URL)
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['name'], 'warranty')
@@ -11,5 +11,6 @@ router.register('products', views.ProductViewSet)
 app_name = 'product'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls))
 ]
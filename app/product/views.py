@@ -1,18 +1,34 @@
-from rest_framework import viewsets, mixins
+from django.db.models import Count, Max, Subquery
+
+from rest_framework import generics, viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core.conditional import ConditionalGetMixin
+from core.idempotency import IdempotentCreateMixin
 from core.models import Tag, Product
+from core.renderers import MessagePackRenderer, MessagePackParser
+from core.sparse_fields import SparseFieldsViewMixin
+from core.throttling import ProductWriteThrottle
 
-from product import serializers
+from product import recommendations, serializers, summary, sync, \
+    tagging
 
 
-class TagViewSet(viewsets.GenericViewSet,
+class TagViewSet(IdempotentCreateMixin, viewsets.GenericViewSet,
                  mixins.ListModelMixin,
                  mixins.CreateModelMixin):
     """Manage tags in the database"""
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + \
+        [MessagePackRenderer]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + \
+        [MessagePackParser]
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
 
@@ -24,13 +40,26 @@ class TagViewSet(viewsets.GenericViewSet,
         """Create a new tag"""
         serializer.save(user=self.request.user)
 
+    @action(detail=False)
+    def stats(self, request):
+        """Return the user's tags with product counts, most used first"""
+        queryset = self.get_queryset().order_by('-product_count', 'name')
+        serializer = serializers.TagStatsSerializer(queryset, many=True)
+        return Response(serializer.data)
+
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(IdempotentCreateMixin, ConditionalGetMixin,
+                     SparseFieldsViewMixin, viewsets.ModelViewSet):
     """Manage products in the database"""
     serializer_class = serializers.ProductSerializer
     queryset = Product.objects.all()
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (ProductWriteThrottle,)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + \
+        [MessagePackRenderer]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + \
+        [MessagePackParser]
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integeres"""
@@ -43,8 +72,47 @@ class ProductViewSet(viewsets.ModelViewSet):
         if tags:
             tag_ids = self._params_to_ints(tags)
             queryset = queryset.filter(tags__id__in=tag_ids)
+        if self.wants_field('tags'):
+            queryset = queryset.prefetch_tags(self.request.user)
+
+        return self.only_columns(queryset).filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """List products, or answer 304 if none changed since last time.
+
+        The row count is part of the version so deletions are noticed;
+        Last-Modified is not sent since it cannot reflect them.
+        """
+        version = Product.objects.filter(user=request.user).aggregate(
+            updated=Max('updated_at'), count=Count('id')
+        )
+        return self.conditional(
+            version, lambda: super(ProductViewSet, self).list(
+                request, *args, **kwargs
+            )
+        )
 
-        return queryset.filter(user=self.request.user)
+    def retrieve(self, request, *args, **kwargs):
+        """Show a product, or answer 304 if it did not change"""
+        try:
+            # Tags are read by user too, so only its partition is probed
+            tags = Tag.objects.filter(
+                user=request.user, product=kwargs['pk']
+            ).order_by('-updated_at').values('updated_at')[:1]
+            row = Product.objects.filter(
+                user=request.user, pk=kwargs['pk']
+            ).annotate(tags_updated=Subquery(tags)).values_list(
+                'updated_at', 'tags_updated'
+            ).first()
+            version = dict(zip(('updated', 'tags'), row or (None, None)))
+        except ValueError:
+            version = {}
+        timestamps = [value for value in version.values() if value]
+        return self.conditional(
+            version, lambda: super(ProductViewSet, self).retrieve(
+                request, *args, **kwargs
+            ), last_modified=max(timestamps) if timestamps else None
+        )
 
     def get_serializer_class(self):
         """Return appropriate serialzier class"""
@@ -56,3 +124,98 @@ class ProductViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Create a new product"""
         serializer.save(user=self.request.user)
+
+    @action(detail=False)
+    def summary(self, request):
+        """Return the user's product price totals, overall and by tag"""
+        return Response(summary.get(request.user.pk))
+
+    @action(detail=False)
+    def recommendations(self, request):
+        """Return catalog products addressing the user's weakest scores"""
+        return Response(recommendations.recommend(request.user))
+
+    def _change_tags(self, request, change, key, pk=None):
+        """Apply a tag delta to one product, or to the listed products"""
+        if pk is None:
+            serializer_class = serializers.BulkTagDeltaSerializer
+        else:
+            serializer_class = serializers.TagDeltaSerializer
+        serializer = serializer_class(data=request.data,
+                                      context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        if pk is None:
+            product_ids = serializer.validated_data['products']
+        else:
+            product_ids = [generics.get_object_or_404(
+                Product.objects.filter(user=request.user).only('id'), pk=pk
+            ).pk]
+        count = change(request.user, product_ids,
+                       serializer.validated_data['tags'])
+        return Response({key: count})
+
+    @action(methods=['post'], detail=True, url_path='tags/add',
+            url_name='add-tags')
+    def add_tags(self, request, pk=None):
+        """Add tags to a product, keeping its other tags"""
+        return self._change_tags(request, tagging.add_tags, 'added', pk)
+
+    @action(methods=['post'], detail=True, url_path='tags/remove',
+            url_name='remove-tags')
+    def remove_tags(self, request, pk=None):
+        """Remove tags from a product, keeping its other tags"""
+        return self._change_tags(request, tagging.remove_tags, 'removed', pk)
+
+    @action(methods=['post'], detail=False, url_path='tags/add',
+            url_name='bulk-add-tags')
+    def bulk_add_tags(self, request):
+        """Add tags to each of the listed products"""
+        return self._change_tags(request, tagging.add_tags, 'added')
+
+    @action(methods=['post'], detail=False, url_path='tags/remove',
+            url_name='bulk-remove-tags')
+    def bulk_remove_tags(self, request):
+        """Remove tags from each of the listed products"""
+        return self._change_tags(request, tagging.remove_tags, 'removed')
+
+
+class SyncView(APIView):
+    """Return products and tags changed since an opaque cursor"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + \
+        [MessagePackRenderer]
+    default_limit = 500
+    max_limit = 1000
+
+    def get(self, request):
+        """Return the next page of changes after ?since=, all without it"""
+        errors = {}
+        since = request.query_params.get('since')
+        position = (0, 0)
+        if since:
+            try:
+                position = sync.decode_cursor(since)
+            except ValueError:
+                errors['since'] = ['Invalid cursor.']
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            errors['limit'] = [
+                'Must be an integer from 1 to %d.' % self.max_limit
+            ]
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = sync.changes(request.user, position, limit)
+        return Response({
+            'products': serializers.ProductSerializer(
+                result['products'], many=True
+            ).data,
+            'tags': serializers.TagSerializer(result['tags'], many=True).data,
+            'deleted': result['deleted'],
+            'cursor': sync.encode_cursor(result['position']),
+            'has_more': result['has_more'],
+        })
@@ -0,0 +1,133 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import Sum
+
+from core.models import Score, ScoreBucket
+
+
+METRICS = ('score_overall', 'score_medical', 'score_income', 'score_stuff',
+           'score_liability', 'score_digital')
+AGE_BANDS = (
+    (18, 24, '18-24'),
+    (25, 34, '25-34'),
+    (35, 44, '35-44'),
+    (45, 54, '45-54'),
+    (55, 64, '55-64'),
+    (65, 150, '65+'),
+)
+PERCENTILES = (10, 25, 50, 75, 90)
+
+UPSERT_SQL = """
+    INSERT INTO {table} (metric, education, employment, age_band, value,
+                         count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (metric, education, employment, age_band, value)
+    DO UPDATE SET count = {table}.count + EXCLUDED.count
+"""
+
+
+def age_band(age):
+    """Return the label of the age band containing age"""
+    if age is not None:
+        for low, high, label in AGE_BANDS:
+            if low <= age <= high:
+                return label
+    return ''
+
+
+def score_cells(education, employment, age, scores):
+    """Return the rollup cells one user contributes to.
+
+    scores maps metric names to values; missing or null metrics do not
+    contribute.
+    """
+    if not scores:
+        return []
+    segment = (education or '', employment or '', age_band(age))
+    return [(metric,) + segment + (scores[metric],)
+            for metric in METRICS if scores.get(metric) is not None]
+
+
+def apply_delta(removed, added):
+    """Decrement the removed cells and increment the added ones"""
+    delta = Counter(added)
+    delta.subtract(Counter(removed))
+    rows = [cell + (count,) for cell, count in delta.items() if count]
+    if not rows:
+        return
+    using = router.db_for_write(ScoreBucket)
+    sql = UPSERT_SQL.format(table=ScoreBucket._meta.db_table)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def user_cells(queryset):
+    """Return the rollup cells of every user in a user queryset"""
+    fields = ['education', 'employment', 'age'] + \
+        ['scores_final__%s' % metric for metric in METRICS]
+    cells = []
+    for row in queryset.filter(scores_final__isnull=False).values(*fields):
+        scores = {metric: row['scores_final__%s' % metric]
+                  for metric in METRICS}
+        cells.extend(score_cells(row['education'], row['employment'],
+                                 row['age'], scores))
+    return cells
+
+
+def rebuild():
+    """Recompute the whole rollup table from users and their final scores"""
+    with transaction.atomic():
+        ScoreBucket.objects.all().delete()
+        apply_delta([], user_cells(get_user_model().objects.all()))
+
+
+def percentile(counts, total, pct):
+    """Return the nearest-rank percentile of sorted (value, count) pairs"""
+    rank = max(1, -(-total * pct // 100))
+    seen = 0
+    for value, count in counts:
+        seen += count
+        if seen >= rank:
+            return value
+    return None
+
+
+def distribution(bin_width=10, **segment):
+    """Return histograms and percentiles for each metric.
+
+    segment may filter on education, employment and age_band.  Reads go to
+    the SCORE_ANALYTICS_DATABASE alias so they can be pointed at a replica.
+    """
+    rows = ScoreBucket.objects.using(settings.SCORE_ANALYTICS_DATABASE) \
+        .filter(**segment).values('metric', 'value') \
+        .annotate(total=Sum('count')).order_by('metric', 'value')
+    by_metric = {metric: [] for metric in METRICS}
+    for row in rows:
+        if row['total'] and row['metric'] in by_metric:
+            by_metric[row['metric']].append((row['value'], row['total']))
+
+    last_bin = max(1, Score.MAX_Score // bin_width) - 1
+    result = {}
+    for metric, counts in by_metric.items():
+        total = sum(count for _, count in counts)
+        bins = Counter()
+        for value, count in counts:
+            bins[min(value // bin_width, last_bin)] += count
+        result[metric] = {
+            'count': total,
+            'histogram': [
+                {'start': index * bin_width,
+                 'end': Score.MAX_Score if index == last_bin
+                 else (index + 1) * bin_width - 1,
+                 'count': bins[index]}
+                for index in range(last_bin + 1)
+            ],
+            'percentiles': {
+                'p%d' % pct: percentile(counts, total, pct) if total else None
+                for pct in PERCENTILES
+            },
+        }
+    return result
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ScoreConfig(AppConfig):
     name = 'score'
+
+    def ready(self):
+        from score import signals  # noqa
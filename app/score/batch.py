@@ -0,0 +1,62 @@
+"""Final scores of many users at once, streamed as JSON.
+
+The requested ids and phone numbers are looked up SCORE_BATCH_CHUNK_SIZE
+at a time, each chunk in one IN query joined with the final score, and
+every chunk is rendered and sent before the next is read.  The response
+never holds more than a chunk of users, however many were asked for.
+
+The body is {"results": [...], "missing": {"ids": [...],
+"phone_numbers": [...]}}, results in the requested order.  Inactive users,
+such as those being deleted, count as missing.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core.renderers import FastJSONRenderer
+
+from score.serializers import ScoreSerializer
+
+
+KEYS = (('ids', 'id'), ('phone_numbers', 'phone_number'))
+
+
+def users(field, keys):
+    """Return active users by the given field value, with final scores"""
+    queryset = get_user_model().objects.filter(
+        is_active=True, **{'%s__in' % field: keys}
+    ).select_related('scores_final').only(
+        'id', 'phone_number', 'scores_final'
+    )
+    return {getattr(user, field): user for user in queryset}
+
+
+def stream(ids=(), phone_numbers=(), chunk_size=None):
+    """Yield the JSON body for the given users, a chunk at a time"""
+    chunk_size = chunk_size or getattr(settings, 'SCORE_BATCH_CHUNK_SIZE',
+                                       1000)
+    render = FastJSONRenderer().render
+    requested = {'ids': ids, 'phone_numbers': phone_numbers}
+    missing = {name: [] for name, _ in KEYS}
+    separator = b''
+    yield b'{"results":['
+    for name, field in KEYS:
+        keys = list(dict.fromkeys(requested[name]))
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            found = users(field, chunk)
+            items = []
+            for key in chunk:
+                user = found.get(key)
+                if user is None:
+                    missing[name].append(key)
+                    continue
+                items.append({
+                    'id': user.id,
+                    'phone_number': user.phone_number,
+                    'scores_final': ScoreSerializer(user.scores_final).data
+                    if user.scores_final is not None else None,
+                })
+            if items:
+                yield separator + render(items)[1:-1]
+                separator = b','
+    yield b'],"missing":' + render(missing) + b'}'
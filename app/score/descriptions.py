@@ -0,0 +1,30 @@
+import hashlib
+from functools import lru_cache
+
+from core.models import ScoreText
+
+
+def digest(text):
+    """Return the digest identifying a description text.
+
+    Must match md5() in PostgreSQL, see migration 0005.
+    """
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def intern(text):
+    """Return the id of the stored copy of text, storing it if needed"""
+    score_text, _ = ScoreText.objects.get_or_create(
+        digest=digest(text), defaults={'text': text}
+    )
+    return score_text.id
+
+
+@lru_cache(maxsize=4096)
+def text_for(text_id):
+    """Return the description text with the given id.
+
+    Interned texts are never modified, so they are cached for the life of
+    the process.
+    """
+    return ScoreText.objects.values_list('text', flat=True).get(id=text_id)
@@ -0,0 +1,90 @@
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import ScoreHistory
+
+
+# A partition cannot be created while the default partition holds rows in
+# its range, so the partition is built as a plain table, the rows are moved
+# into it and it is then attached
+PARTITION_SQL = (
+    'CREATE TABLE {name} (LIKE core_scorehistory INCLUDING DEFAULTS)',
+    'WITH moved AS (DELETE FROM core_scorehistory_default '
+    'WHERE created_at >= %(start)s AND created_at < %(end)s RETURNING *) '
+    'INSERT INTO {name} SELECT * FROM moved',
+    'ALTER TABLE core_scorehistory ATTACH PARTITION {name} '
+    'FOR VALUES FROM (%(start)s) TO (%(end)s)',
+)
+
+
+def record_score(user, score):
+    """Append score to the user's history and make it the current score"""
+    with transaction.atomic():
+        entry = ScoreHistory.objects.create(user=user, score=score)
+        user.scores_final = score
+        update_fields = ['scores_final', 'updated_at']
+        if user.scores_initial_id is None:
+            user.scores_initial = score
+            update_fields.append('scores_initial')
+        user.save(update_fields=update_fields)
+    return entry
+
+
+def record_initial_score(user, score):
+    """Record score as the user's first score, leaving the current one.
+
+    The entry is dated before the user's earliest history entry, or at
+    registration if that comes first, so it stays the first row.
+    """
+    with transaction.atomic():
+        created_at = user.date_joined or timezone.now()
+        earliest = ScoreHistory.objects.filter(user=user) \
+            .order_by('created_at') \
+            .values_list('created_at', flat=True).first()
+        if earliest is not None:
+            created_at = min(created_at,
+                             earliest - datetime.timedelta(microseconds=1))
+        entry = ScoreHistory.objects.create(user=user, score=score,
+                                            created_at=created_at)
+        user.scores_initial = score
+        user.save(update_fields=['scores_initial', 'updated_at'])
+    return entry
+
+
+def month_start(day, offset=0):
+    """Return the first day of the month offset months after day"""
+    months = day.year * 12 + day.month - 1 + offset
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def create_partition(start):
+    """Create the history partition of the month starting on start.
+
+    Rows of that month already in the default partition are moved into the
+    new partition.  Returns the name of the partition.
+    """
+    name = 'core_scorehistory_y%04dm%02d' % (start.year, start.month)
+    params = {'start': start, 'end': month_start(start, 1)}
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Keep rows of the month from landing in the default partition
+        # until the new one is attached
+        cursor.execute('LOCK TABLE core_scorehistory_default '
+                       'IN EXCLUSIVE MODE')
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is None:
+            for sql in PARTITION_SQL:
+                cursor.execute(sql.format(name=name), params)
+    return name
+
+
+def create_partitions(months=3):
+    """Create the monthly history partitions from this month on.
+
+    Returns the names of the partitions covered.  Rows outside them land in
+    the default partition, so partitions should be created ahead of time.
+    """
+    today = timezone.now().date()
+    return [create_partition(month_start(today, offset))
+            for offset in range(months)]
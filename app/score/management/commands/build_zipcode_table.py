@@ -0,0 +1,53 @@
+import csv
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from score import zipcodes
+
+
+class Command(BaseCommand):
+    """Django command to build the zipcode reference file from a CSV.
+
+    The CSV needs a zipcode column; every other column becomes a numeric
+    field of the table.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--output', default=settings.ZIPCODE_TABLE_PATH)
+        parser.add_argument('--data-version', type=int,
+                            default=int(time.time()))
+
+    def handle(self, *args, **options):
+        with open(options['csv_path'], newline='') as f:
+            reader = csv.DictReader(f)
+            if 'zipcode' not in (reader.fieldnames or ()):
+                raise CommandError('CSV has no zipcode column')
+            fields = [name for name in reader.fieldnames if name != 'zipcode']
+            rows = {}
+            for line, record in enumerate(reader, start=2):
+                try:
+                    rows[int(record['zipcode'])] = [
+                        float(record[field]) if record[field] else float('nan')
+                        for field in fields
+                    ]
+                except ValueError as exc:
+                    raise CommandError('Line %d: %s' % (line, exc))
+
+        output = options['output']
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        # Write next to the target and swap, so mapped readers are unaffected
+        tmp_path = '%s.%d.tmp' % (output, os.getpid())
+        try:
+            zipcodes.write_table(tmp_path, fields, rows,
+                                 options['data_version'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        os.replace(tmp_path, output)
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d zipcodes with fields %s to %s' %
+            (len(rows), ', '.join(fields), output)
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from score import history
+
+
+class Command(BaseCommand):
+    """Django command to create upcoming monthly score history partitions"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3,
+                            help='Number of months to cover from now on')
+
+    def handle(self, *args, **options):
+        for name in history.create_partitions(options['months']):
+            self.stdout.write('Partition %s ready' % name)
+        self.stdout.write(self.style.SUCCESS('Score history partitioned!'))
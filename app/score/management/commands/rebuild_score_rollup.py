@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from score import analytics
+
+
+class Command(BaseCommand):
+    """Django command to recompute the score distribution rollup"""
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding score rollup...')
+        analytics.rebuild()
+        self.stdout.write(self.style.SUCCESS('Score rollup rebuilt!'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+TABLES = ('core_score', 'core_scoretext')
+
+
+class Command(BaseCommand):
+    """Django command to report the disk usage of score tables.
+
+    Run it before and after migrating to interned descriptions; the space
+    of the dropped text columns is reclaimed once core_score is rewritten,
+    e.g. by VACUUM FULL.
+    """
+
+    def handle(self, *args, **options):
+        total = 0
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(
+                    'SELECT COALESCE(pg_total_relation_size(to_regclass(%s)), '
+                    '0)', [table]
+                )
+                size = cursor.fetchone()[0]
+                total += size
+                self.stdout.write('%-16s %12d bytes' % (table, size))
+        self.stdout.write('%-16s %12d bytes' % ('total', total))
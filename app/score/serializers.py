@@ -1,10 +1,49 @@
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import ugettext_lazy as _
+
 from rest_framework import serializers
 
-from core.models import Score
+from core.models import Score, ScoreHistory
+
+from score import descriptions
+
+
+class DescriptionField(serializers.Field):
+    """Description text stored as a reference to an interned ScoreText"""
+    default_error_messages = {
+        'invalid': _('Not a valid string.')
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        if self.source is None:
+            self.source = '%s_id' % field_name
+        super().bind(field_name, parent)
+
+    def to_representation(self, value):
+        return descriptions.text_for(value)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        return descriptions.intern(data)
 
 
 class ScoreSerializer(serializers.ModelSerializer):
     """Serializer for score object"""
+    desc_overall = DescriptionField()
+    desc_medical = DescriptionField()
+    desc_income = DescriptionField()
+    desc_stuff = DescriptionField()
+    desc_liability = DescriptionField()
+    desc_digital = DescriptionField()
 
     class Meta:
         model = Score
@@ -13,4 +52,72 @@ class ScoreSerializer(serializers.ModelSerializer):
                   'score_digital', 'desc_overall', 'desc_medical',
                   'desc_income', 'desc_stuff', 'desc_liability',
                   'desc_digital')
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',)
+
+
+class ScoreHistorySerializer(serializers.ModelSerializer):
+    """Serializer for score history entries"""
+    score = ScoreSerializer(read_only=True)
+
+    class Meta:
+        model = ScoreHistory
+        fields = ('created_at', 'score')
+        read_only_fields = fields
+
+
+class SimulationProfileSerializer(serializers.Serializer):
+    """Serializer for a hypothetical profile to estimate scores for"""
+    education = serializers.ChoiceField(
+        choices=get_user_model().EDUCATION_CHOICES, required=False,
+        allow_null=True, allow_blank=True
+    )
+    employment = serializers.ChoiceField(
+        choices=get_user_model().EMPLOYMENT_CHOICES, required=False,
+        allow_null=True, allow_blank=True
+    )
+    age = serializers.IntegerField(min_value=18, max_value=150,
+                                   required=False, allow_null=True)
+    # Profile fields the rollup has no segments for, rejected rather than
+    # ignored so an estimate never silently leaves them out
+    unsupported_fields = ('income',)
+
+    def to_internal_value(self, data):
+        """Reject profiles changing fields the estimate cannot account for"""
+        errors = {
+            field: [_('Not supported by the simulation.')]
+            for field in self.unsupported_fields
+            if isinstance(data, Mapping) and field in data
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+        return super().to_internal_value(data)
+
+
+class SimulationSerializer(serializers.Serializer):
+    """Serializer for a batch of hypothetical profiles"""
+    profiles = serializers.ListField(child=SimulationProfileSerializer(),
+                                     min_length=1, max_length=100)
+
+
+class ScoreBatchSerializer(serializers.Serializer):
+    """Serializer for the users to look up the scores of"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                required=False)
+    phone_numbers = serializers.ListField(
+        child=serializers.CharField(max_length=17), required=False
+    )
+
+    def validate(self, attrs):
+        """Require some users, but no more than the batch limit"""
+        count = len(attrs.get('ids', [])) + \
+            len(attrs.get('phone_numbers', []))
+        limit = getattr(settings, 'SCORE_BATCH_MAX_USERS', 10000)
+        if not count:
+            raise serializers.ValidationError(
+                _('Provide ids or phone numbers.')
+            )
+        if count > limit:
+            raise serializers.ValidationError(
+                _('No more than %d users at once.') % limit
+            )
+        return attrs
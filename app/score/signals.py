@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import Score
+
+from score import analytics
+
+
+User = get_user_model()
+ROLLUP_FIELDS = {'education', 'employment', 'age', 'scores_final'}
+
+
+def _score_values(score):
+    return {metric: getattr(score, metric) for metric in analytics.METRICS}
+
+
+@receiver(pre_save, sender=User)
+def remember_user_cells(sender, instance, update_fields=None, **kwargs):
+    """Record the rollup cells of the stored version of a user"""
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        instance._rollup_cells = None
+        return
+    instance._rollup_cells = analytics.user_cells(
+        User.objects.filter(pk=instance.pk)
+    ) if instance.pk else []
+
+
+@receiver(post_save, sender=User)
+def update_user_cells(sender, instance, **kwargs):
+    """Move a saved user's contribution to its current rollup cells"""
+    old_cells = getattr(instance, '_rollup_cells', None)
+    if old_cells is None:
+        return
+    instance._rollup_cells = None
+    scores = None
+    if instance.scores_final_id:
+        scores = _score_values(instance.scores_final)
+    analytics.apply_delta(old_cells, analytics.score_cells(
+        instance.education, instance.employment, instance.age, scores
+    ))
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_cells(sender, instance, **kwargs):
+    """Remove a deleted user's contribution from the rollup"""
+    analytics.apply_delta(
+        analytics.user_cells(User.objects.filter(pk=instance.pk)), []
+    )
+
+
+@receiver(pre_save, sender=Score)
+def remember_score_cells(sender, instance, **kwargs):
+    """Record the rollup cells of the users whose final score is edited"""
+    instance._rollup_cells = analytics.user_cells(
+        User.objects.filter(scores_final=instance.pk)
+    ) if instance.pk else []
+
+
+@receiver(post_save, sender=Score)
+def update_score_cells(sender, instance, created, **kwargs):
+    """Move the contribution of users whose final score was edited"""
+    old_cells = getattr(instance, '_rollup_cells', None)
+    instance._rollup_cells = None
+    # A new score has no users yet; an edited one may have users without
+    # cells, as when all its metrics were null
+    if created or old_cells is None:
+        return
+    scores = _score_values(instance)
+    new_cells = []
+    users = User.objects.filter(scores_final=instance.pk) \
+        .values('education', 'employment', 'age')
+    for user in users:
+        new_cells.extend(analytics.score_cells(
+            user['education'], user['employment'], user['age'], scores
+        ))
+    if old_cells or new_cells:
+        analytics.apply_delta(old_cells, new_cells)
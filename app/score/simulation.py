@@ -0,0 +1,146 @@
+"""What-if estimates of a user's scores under a changed profile.
+
+Scores are computed by the clients, so there is no scoring function here
+to run again.  The estimate is an additive model fitted to the population
+rollup in core.ScoreBucket: the education, employment and age band of a
+profile each shift a metric by how far the mean score of users in that
+segment is from the overall mean.  A simulated score is the user's final
+score moved by the difference between the shifts of the hypothetical and
+the current profile, or the overall mean plus the hypothetical shifts for
+metrics the user has no score for, clamped to the score range.  Income is
+not a rollup dimension, so profiles naming it are rejected.
+
+The shifts are memoized per process.  They are keyed by a period of
+SCORE_SIMULATION_CACHE_SECONDS, so a new period reads the rollup again.
+Once warm, evaluating any number of profiles reads nothing from the
+database.
+"""
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F, Sum
+
+from core.models import Score, ScoreBucket
+
+from score import analytics
+
+
+DIMENSIONS = ('education', 'employment', 'age_band')
+
+
+def period():
+    """Return the cache period the rollup is read for"""
+    return int(time.time() //
+               getattr(settings, 'SCORE_SIMULATION_CACHE_SECONDS', 300))
+
+
+@lru_cache(maxsize=2)
+def rollup_means(period):
+    """Return the mean of each metric overall and in each segment value.
+
+    The result maps (metric, None, None) and (metric, dimension, value) to
+    means; segments without users are missing.
+    """
+    rows = ScoreBucket.objects.using(settings.SCORE_ANALYTICS_DATABASE) \
+        .values('metric', *DIMENSIONS).annotate(
+            total=Sum(F('value') * F('count'),
+                      output_field=models.BigIntegerField()),
+            users=Sum('count'),
+        )
+    sums = defaultdict(lambda: [0, 0])
+    for row in rows:
+        if not row['users']:
+            continue
+        keys = [(row['metric'], None, None)] + \
+            [(row['metric'], dimension, row[dimension])
+             for dimension in DIMENSIONS]
+        for key in keys:
+            sums[key][0] += row['total']
+            sums[key][1] += row['users']
+    return {key: total / users for key, (total, users) in sums.items()}
+
+
+@lru_cache(maxsize=4096)
+def overall_mean(metric, period):
+    """Return the population mean of a metric, or None without data"""
+    return rollup_means(period).get((metric, None, None))
+
+
+@lru_cache(maxsize=4096)
+def shift(metric, dimension, value, period):
+    """Return how far a segment's mean of a metric is from the overall mean.
+
+    Segments without users do not shift the score.
+    """
+    mean = rollup_means(period).get((metric, dimension, value))
+    if mean is None:
+        return 0.0
+    return mean - overall_mean(metric, period)
+
+
+def segment(profile):
+    """Return the rollup segment values of a profile"""
+    return {
+        'education': profile.get('education') or '',
+        'employment': profile.get('employment') or '',
+        'age_band': analytics.age_band(profile.get('age')),
+    }
+
+
+def estimate(scores, current, profile, at=None):
+    """Return the estimated scores of a profile.
+
+    scores maps metrics to the user's current values, which may be None;
+    current and profile are the current and hypothetical education,
+    employment and age.  Metrics without population data are None.
+    """
+    at = period() if at is None else at
+    current, hypothetical = segment(current), segment(profile)
+    result = {}
+    for metric in analytics.METRICS:
+        mean = overall_mean(metric, at)
+        if mean is None:
+            result[metric] = None
+            continue
+        value = scores.get(metric)
+        if value is None:
+            value = mean + sum(
+                shift(metric, dimension, hypothetical[dimension], at)
+                for dimension in DIMENSIONS
+            )
+        else:
+            value += sum(
+                shift(metric, dimension, hypothetical[dimension], at) -
+                shift(metric, dimension, current[dimension], at)
+                for dimension in DIMENSIONS
+            )
+        result[metric] = min(max(int(round(value)), Score.MIN_SCORE),
+                             Score.MAX_Score)
+    return result
+
+
+def simulate(user, profiles):
+    """Return the current scores of a user and estimates for profiles.
+
+    Fields missing from a profile keep the user's current value.
+    """
+    scores = {metric: getattr(user.scores_final, metric, None)
+              for metric in analytics.METRICS}
+    current = {field: getattr(user, field)
+               for field in ('education', 'employment', 'age')}
+    at = period()
+    results = []
+    for profile in profiles:
+        profile = dict(current, **profile)
+        results.append({'profile': profile,
+                        'scores': estimate(scores, current, profile, at)})
+    return {'current': dict(current, scores=scores), 'results': results}
+
+
+def reset():
+    """Forget the memoized rollup means and shifts"""
+    for function in (rollup_means, overall_mean, shift):
+        function.cache_clear()
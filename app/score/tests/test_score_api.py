@@ -0,0 +1,462 @@
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Score, ScoreBucket, ScoreHistory, ScoreText
+
+from score import descriptions, history, simulation
+from score.serializers import ScoreSerializer
+
+
+ANALYTICS_URL = reverse('score:analytics')
+ME_URL = reverse('user:me')
+HISTORY_URL = reverse('score:history')
+SIMULATE_URL = reverse('score:simulate')
+BATCH_URL = reverse('score:batch')
+
+
+def sample_score(overall=50, **params):
+    """Create and return a sample score"""
+    defaults = {
+        'version': '0.0',
+        'score_overall': overall,
+        'score_medical': 10,
+        'score_income': 20,
+        'score_stuff': 30,
+        'score_liability': 40,
+        'score_digital': 50,
+    }
+    defaults.update(params)
+
+    return Score.objects.create(**defaults)
+
+
+def sample_user(phone_number, **params):
+    """Create and return a sample user"""
+    return get_user_model().objects.create_user(
+        phone_number, 'testpass', **params
+    )
+
+
+class PublicScoreApiTests(TestCase):
+    """Test unauthorized score API access"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_analytics_staff_only(self):
+        """Test that analytics require a staff user"""
+        self.client.force_authenticate(sample_user('4086432477'))
+
+        res = self.client.get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ScoreAnalyticsApiTests(TestCase):
+    """Test the score distribution analytics API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_superuser(
+            '4086432400', 'testpass'
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_distribution_of_final_scores(self):
+        """Test histograms and percentiles cover users' final scores"""
+        for index, overall in enumerate((15, 55, 95, 100)):
+            sample_user('40864324%02d' % (index + 1), age=30,
+                        education='College',
+                        scores_final=sample_score(overall))
+
+        res = self.client.get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        overall = res.data['metrics']['score_overall']
+        self.assertEqual(overall['count'], 4)
+        self.assertEqual(len(overall['histogram']), 10)
+        self.assertEqual(overall['histogram'][1]['count'], 1)
+        self.assertEqual(overall['histogram'][9],
+                         {'start': 90, 'end': 100, 'count': 2})
+        self.assertEqual(overall['percentiles']['p50'], 55)
+        self.assertEqual(overall['percentiles']['p90'], 100)
+
+    def test_distribution_segmented(self):
+        """Test filtering the distribution by education and age band"""
+        sample_user('4086432401', age=20, education='College',
+                    scores_final=sample_score(10))
+        sample_user('4086432402', age=40, education='College',
+                    scores_final=sample_score(90))
+
+        res = self.client.get(ANALYTICS_URL, {'education': 'College',
+                                              'age_band': '35-44'})
+
+        overall = res.data['metrics']['score_overall']
+        self.assertEqual(overall['count'], 1)
+        self.assertEqual(overall['percentiles']['p10'], 90)
+
+    def test_invalid_bin_width(self):
+        """Test that an invalid bin width is rejected"""
+        res = self.client.get(ANALYTICS_URL, {'bin': 'wide'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rollup_follows_score_changes(self):
+        """Test the rollup moves when a user's final score changes"""
+        score = sample_score(10)
+        user = sample_user('4086432401', scores_final=score)
+
+        score.score_overall = 20
+        score.save()
+        user.scores_final = sample_score(30)
+        user.education = 'University'
+        user.save()
+
+        buckets = ScoreBucket.objects.filter(metric='score_overall',
+                                             count__gt=0)
+        self.assertEqual(
+            list(buckets.values_list('education', 'value', 'count')),
+            [('University', 30, 1)]
+        )
+
+        user.delete()
+        self.assertFalse(ScoreBucket.objects.filter(count__gt=0).exists())
+
+    def test_rollup_counts_score_given_metrics(self):
+        """Test a final score without metrics enters the rollup once set"""
+        score = Score.objects.create()
+        sample_user('4086432401', scores_final=score)
+        self.assertFalse(ScoreBucket.objects.filter(count__gt=0).exists())
+
+        score.score_overall = 40
+        score.save()
+
+        buckets = ScoreBucket.objects.filter(metric='score_overall',
+                                             count__gt=0)
+        self.assertEqual(list(buckets.values_list('value', 'count')),
+                         [(40, 1)])
+
+    def test_rebuild_score_rollup(self):
+        """Test the rollup can be rebuilt from scratch"""
+        sample_user('4086432401', scores_final=sample_score(10))
+        ScoreBucket.objects.all().delete()
+
+        call_command('rebuild_score_rollup')
+
+        bucket = ScoreBucket.objects.get(metric='score_overall')
+        self.assertEqual((bucket.value, bucket.count), (10, 1))
+
+
+class ScoreSimulationApiTests(TestCase):
+    """Test the what-if score simulation API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        simulation.reset()
+        sample_user('4086432401', age=30, education='College',
+                    scores_final=sample_score(40))
+        sample_user('4086432402', age=30, education='University',
+                    scores_final=sample_score(80))
+        self.user = sample_user('4086432477', age=30, education='College',
+                                scores_final=sample_score(50))
+        self.client.force_authenticate(self.user)
+
+    def test_simulate_profiles(self):
+        """Test each profile is estimated from the segment means"""
+        res = self.client.post(SIMULATE_URL, {'profiles': [
+            {'education': 'University'}, {'age': 70},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['current']['scores']['score_overall'], 50)
+        university, older = res.data['results']
+        self.assertEqual(university['profile'],
+                         {'education': 'University', 'employment': None,
+                          'age': 30})
+        self.assertEqual(university['scores']['score_overall'], 85)
+        self.assertEqual(university['scores']['score_medical'], 10)
+        self.assertEqual(older['scores']['score_overall'], 50)
+
+    def test_simulate_without_score(self):
+        """Test users without a score get the population estimate"""
+        user = sample_user('4086432478', age=30)
+        self.client.force_authenticate(user)
+
+        res = self.client.post(SIMULATE_URL, {'profiles': [
+            {'education': 'University'}
+        ]}, format='json')
+
+        self.assertIsNone(res.data['current']['scores']['score_overall'])
+        self.assertEqual(res.data['results'][0]['scores']['score_overall'],
+                         80)
+
+    def test_simulate_memoized(self):
+        """Test repeated simulations neither read nor write the database"""
+        payload = {'profiles': [{'education': 'University'}]}
+        self.client.post(SIMULATE_URL, payload, format='json')
+
+        with self.assertNumQueries(0):
+            res = self.client.post(SIMULATE_URL, {'profiles': [
+                {'education': 'High school', 'employment': 'Student'}
+            ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_simulate_invalid_profiles(self):
+        """Test unknown choices and empty batches are rejected"""
+        for payload in ({'profiles': []},
+                        {'profiles': [{'education': 'Kindergarten'}]}):
+            res = self.client.post(SIMULATE_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_simulate_income_rejected(self):
+        """Test a profile changing income is rejected, not ignored"""
+        res = self.client.post(SIMULATE_URL, {'profiles': [
+            {'education': 'University', 'income': 90000}
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('income', res.data['profiles'][0])
+
+
+class ScoreBatchApiTests(TestCase):
+    """Test looking up the scores of many users"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_superuser(
+            '4086432400', 'testpass'
+        )
+        self.client.force_authenticate(self.staff)
+        self.users = [
+            sample_user('408643241%d' % index,
+                        scores_final=sample_score(10 * index))
+            for index in range(5)
+        ]
+
+    def lookup(self, payload):
+        res = self.client.post(BATCH_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return json.loads(b''.join(res.streaming_content))
+
+    def test_batch_staff_only(self):
+        """Test that batch lookups require a staff user"""
+        self.client.force_authenticate(self.users[0])
+
+        res = self.client.post(BATCH_URL, {'ids': [self.users[0].id]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_lookup(self):
+        """Test scores are returned in order and unknown users listed"""
+        inactive = sample_user('4086432420', is_active=False,
+                               scores_final=sample_score(90))
+        no_score = sample_user('4086432421')
+
+        data = self.lookup({
+            'ids': [self.users[2].id, inactive.id, self.users[0].id, 999999],
+            'phone_numbers': [no_score.phone_number, '4086432499'],
+        })
+
+        self.assertEqual(
+            [(item['id'], item['scores_final'] and
+              item['scores_final']['score_overall'])
+             for item in data['results']],
+            [(self.users[2].id, 20), (self.users[0].id, 0),
+             (no_score.id, None)]
+        )
+        self.assertEqual(data['missing'], {
+            'ids': [inactive.id, 999999], 'phone_numbers': ['4086432499']
+        })
+
+    @override_settings(SCORE_BATCH_CHUNK_SIZE=2)
+    def test_batch_chunked(self):
+        """Test large batches are read one IN query per chunk"""
+        ids = [user.id for user in self.users]
+
+        with self.assertNumQueries(3):
+            data = self.lookup({'ids': ids})
+
+        self.assertEqual([item['id'] for item in data['results']], ids)
+
+    @override_settings(SCORE_BATCH_MAX_USERS=2)
+    def test_batch_limits(self):
+        """Test empty and oversized batches are rejected"""
+        for payload in ({}, {'ids': [user.id for user in self.users]}):
+            res = self.client.post(BATCH_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ScoreDescriptionTests(TestCase):
+    """Test interned score descriptions"""
+
+    def test_descriptions_interned_once(self):
+        """Test that repeated description texts are stored once"""
+        serializer = ScoreSerializer(data={
+            'score_overall': 50,
+            'desc_overall': 'Looking good',
+            'desc_medical': 'Looking good',
+            'desc_digital': 'Needs work',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        score = serializer.save()
+
+        self.assertEqual(ScoreText.objects.count(), 2)
+        self.assertEqual(score.desc_overall_id, score.desc_medical_id)
+        self.assertIsNone(score.desc_income_id)
+
+    def test_blank_description_round_trips(self):
+        """Test that a blank description is kept rather than nulled"""
+        serializer = ScoreSerializer(data={'desc_overall': ''})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        score = serializer.save()
+
+        self.assertIsNotNone(score.desc_overall_id)
+        self.assertEqual(ScoreSerializer(score).data['desc_overall'], '')
+
+    def test_profile_returns_description_texts(self):
+        """Test that scores are serialized with their description texts"""
+        score = sample_score(
+            desc_overall_id=descriptions.intern('Looking good')
+        )
+        user = sample_user('4086432477', scores_final=score)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['scores_final']['desc_overall'],
+                         'Looking good')
+        self.assertIsNone(res.data['scores_final']['desc_medical'])
+
+
+class ScoreHistoryApiTests(TestCase):
+    """Test the score history API"""
+
+    def setUp(self):
+        self.user = sample_user('4086432477')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_record_score_updates_pointers(self):
+        """Test recording scores keeps the first and latest pointers"""
+        first = sample_score(10)
+        latest = sample_score(20)
+
+        history.record_score(self.user, first)
+        history.record_score(self.user, latest)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.scores_initial, first)
+        self.assertEqual(self.user.scores_final, latest)
+        self.assertEqual(self.user.score_history.count(), 2)
+
+    def test_profile_score_appended_to_history(self):
+        """Test scores submitted with the profile are recorded"""
+        res = self.client.patch(ME_URL, {'scores_final': {
+            'score_overall': 70
+        }}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.scores_final.score_overall, 70)
+        self.assertEqual(self.user.scores_initial, self.user.scores_final)
+        self.assertEqual(
+            list(self.user.score_history.values_list('score', flat=True)),
+            [self.user.scores_final_id]
+        )
+
+    def test_initial_score_leaves_current_score(self):
+        """Test submitting a first score keeps a legacy current score"""
+        final = sample_score(60)
+        self.user.scores_final = final
+        self.user.save()
+
+        res = self.client.patch(ME_URL, {'scores_initial': {
+            'score_overall': 30
+        }}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.scores_final, final)
+        self.assertEqual(self.user.scores_initial.score_overall, 30)
+        self.assertEqual(
+            list(self.user.score_history.values_list('score', flat=True)),
+            [self.user.scores_initial_id]
+        )
+
+    def test_replaced_initial_score_stays_first(self):
+        """Test a replaced first score is recorded before later scores"""
+        history.record_score(self.user, sample_score(10))
+        history.record_score(self.user, sample_score(20))
+
+        res = self.client.patch(ME_URL, {'scores_initial': {
+            'score_overall': 5
+        }}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.scores_initial.score_overall, 5)
+        self.assertEqual(self.user.scores_final.score_overall, 20)
+        first = self.user.score_history.order_by('created_at').first()
+        self.assertEqual(first.score_id, self.user.scores_initial_id)
+        self.assertEqual(self.user.score_history.count(), 3)
+
+    def test_partition_takes_rows_from_default(self):
+        """Test a partition is created for rows in the default partition"""
+        start = history.month_start(timezone.now().date(), 12)
+        entry = ScoreHistory.objects.create(
+            user=self.user, score=sample_score(),
+            created_at=timezone.make_aware(datetime.datetime(
+                start.year, start.month, 15
+            ))
+        )
+
+        name = history.create_partition(start)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM %s' % name)
+            self.assertEqual(cursor.fetchall(), [(entry.id,)])
+            cursor.execute('SELECT count(*) FROM core_scorehistory_default')
+            self.assertEqual(cursor.fetchone(), (0,))
+        self.assertEqual(history.create_partition(start), name)
+
+    def test_history_paged_newest_first(self):
+        """Test the history endpoint pages through scores newest first"""
+        for overall in range(25):
+            history.record_score(self.user, sample_score(overall))
+        history.record_score(sample_user('4086432478'), sample_score(99))
+
+        res = self.client.get(HISTORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 20)
+        self.assertEqual(res.data['results'][0]['score']['score_overall'],
+                         24)
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [entry['score']['score_overall'] for entry in res.data['results']],
+            [4, 3, 2, 1, 0]
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_create_history_partitions(self):
+        """Test monthly history partitions are created"""
+        call_command('create_score_history_partitions', '--months', '2')
+
+        history.record_score(self.user, sample_score(10))
+        self.assertEqual(self.user.score_history.count(), 1)
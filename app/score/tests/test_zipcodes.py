@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from score import zipcodes
+
+
+ME_URL = reverse('user:me')
+CSV = 'zipcode,cost_index,risk_factor\n95014,1.75,0.5\n10001,1.5,\n'
+
+
+class ZipcodeTableTests(TestCase):
+    """Test the memory-mapped zipcode reference table"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmpdir.name, 'zipcodes.csv')
+        self.table_path = os.path.join(self.tmpdir.name, 'zipcodes.bin')
+        with open(self.csv_path, 'w') as f:
+            f.write(CSV)
+        zipcodes.reset()
+
+    def tearDown(self):
+        zipcodes.reset()
+        self.tmpdir.cleanup()
+
+    def build(self, version=7):
+        call_command('build_zipcode_table', self.csv_path,
+                     '--output', self.table_path, '--data-version', version)
+        return zipcodes.ZipcodeTable(self.table_path)
+
+    def test_build_and_lookup(self):
+        """Test building the table from a CSV and looking zipcodes up"""
+        table = self.build()
+
+        self.assertEqual(table.version, 7)
+        self.assertEqual(table.fields, ('cost_index', 'risk_factor'))
+        self.assertEqual(table.get(95014),
+                         {'cost_index': 1.75, 'risk_factor': 0.5})
+        self.assertEqual(table.get(10001),
+                         {'cost_index': 1.5, 'risk_factor': None})
+        self.assertIsNone(table.get(12345))
+        self.assertIsNone(table.get(None))
+
+    def test_batch_lookup(self):
+        """Test looking up many zipcodes at once"""
+        table = self.build()
+
+        self.assertEqual(
+            table.get_many([10001, 99999]),
+            [{'cost_index': 1.5, 'risk_factor': None}, None]
+        )
+        self.assertEqual(table.column('cost_index', [95014, None, 10001]),
+                         [1.75, None, 1.5])
+
+    def test_build_requires_zipcode_column(self):
+        """Test that a CSV without zipcodes is rejected"""
+        with open(self.csv_path, 'w') as f:
+            f.write('zip,cost_index\n95014,1.0\n')
+
+        with self.assertRaises(CommandError):
+            self.build()
+
+    def test_profile_enriched_with_region(self):
+        """Test the profile includes the reference data of its zipcode"""
+        self.build()
+        user = get_user_model().objects.create_user(
+            '4086432477', 'testpass', zipcode=10001
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with override_settings(ZIPCODE_TABLE_PATH=self.table_path):
+            res = client.get(ME_URL)
+
+        self.assertEqual(res.data['region'],
+                         {'cost_index': 1.5, 'risk_factor': None})
+
+    @override_settings(ZIPCODE_TABLE_CHECK_INTERVAL=0)
+    def test_rebuilt_table_mapped_again(self):
+        """Test a rebuilt file replaces the mapped table"""
+        self.build()
+        with override_settings(ZIPCODE_TABLE_PATH=self.table_path):
+            self.assertEqual(zipcodes.get_table().version, 7)
+            with open(self.csv_path, 'a') as f:
+                f.write('90210,2.5,1\n')
+            self.build(version=8)
+
+            table = zipcodes.get_table()
+
+        self.assertEqual(table.version, 8)
+        self.assertEqual(table.get(90210)['cost_index'], 2.5)
+
+    def test_profile_stores_five_digit_zipcode(self):
+        """Test zipcodes above the small integer range can be saved"""
+        user = get_user_model().objects.create_user('4086432477', 'pw')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.patch(ME_URL, {'zipcode': 95014})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.zipcode, 95014)
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from score import views
+
+
+app_name = 'score'
+
+urlpatterns = [
+    path('analytics/', views.ScoreDistributionView.as_view(),
+         name='analytics'),
+    path('history/', views.ScoreHistoryView.as_view(), name='history'),
+    path('simulate/', views.ScoreSimulationView.as_view(), name='simulate'),
+    path('batch/', views.ScoreBatchView.as_view(), name='batch'),
+]
@@ -1,3 +1,83 @@
-from django.shortcuts import render
+from django.http import StreamingHttpResponse
 
-# Create your views here.
+from rest_framework import authentication, generics, permissions, status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models import ScoreHistory
+
+from score import analytics, batch, serializers, simulation
+
+
+class ScoreDistributionView(APIView):
+    """Population score histograms and percentiles from the rollup table"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+    segment_params = ('education', 'employment', 'age_band')
+
+    def get(self, request):
+        """Return the distribution of every score, optionally segmented"""
+        segment = {param: request.query_params[param]
+                   for param in self.segment_params
+                   if param in request.query_params}
+        try:
+            bin_width = int(request.query_params.get('bin', 10))
+        except ValueError:
+            bin_width = 0
+        if not 1 <= bin_width <= 100:
+            return Response({'bin': ['Must be an integer from 1 to 100.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'segment': segment,
+            'metrics': analytics.distribution(bin_width, **segment),
+        })
+
+
+class ScoreHistoryPagination(CursorPagination):
+    """Keyset pagination over the (user, -created_at) history index"""
+    ordering = '-created_at'
+    page_size = 20
+
+
+class ScoreHistoryView(generics.ListAPIView):
+    """Page through the authenticated user's score history, newest first"""
+    serializer_class = serializers.ScoreHistorySerializer
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = ScoreHistoryPagination
+
+    def get_queryset(self):
+        """Return history entries of the authenticated user only"""
+        return ScoreHistory.objects.filter(user=self.request.user) \
+            .select_related('score')
+
+
+class ScoreSimulationView(APIView):
+    """Estimate the user's scores for hypothetical profiles"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        """Return estimated scores for each profile, writing nothing"""
+        serializer = serializers.SimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(simulation.simulate(
+            request.user, serializer.validated_data['profiles']
+        ))
+
+
+class ScoreBatchView(APIView):
+    """Final scores of many users, for internal systems"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request):
+        """Stream the final scores of the listed ids and phone numbers"""
+        serializer = serializers.ScoreBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return StreamingHttpResponse(
+            batch.stream(**serializer.validated_data),
+            content_type='application/json'
+        )
@@ -0,0 +1,153 @@
+"""Zipcode reference data stored in a memory-mapped binary file.
+
+File layout, all little-endian:
+
+    header   magic b'ZIPR', format version (H), field count (H),
+             data version (I)
+    fields   one 32-byte, NUL-padded ASCII name per field
+    values   float32[ZIPCODE_COUNT][field count], row per zipcode, NaN for
+             missing values
+
+Rows are addressed directly by zipcode, so a lookup is one offset
+computation.  The file is mapped read-only once per process; pages are
+shared through the OS page cache by every worker, including workers forked
+after the first lookup.  build_zipcode_table swaps in a new file
+atomically, and each process checks the path at most every
+ZIPCODE_TABLE_CHECK_INTERVAL seconds and maps the new file when it was
+replaced.
+"""
+import array
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+from django.conf import settings
+
+
+MAGIC = b'ZIPR'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+FIELD_NAME_SIZE = 32
+ZIPCODE_COUNT = 100000
+
+_table = None
+_checked_at = 0.0
+
+
+def file_identity(path, stat):
+    """Return what tells a file at path apart from one replacing it"""
+    return path, stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ZipcodeTable:
+    """Read-only view over a zipcode reference file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.identity = file_identity(path, os.fstat(f.fileno()))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, field_count, self.version = \
+            HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError('%s is not a zipcode table v%d' %
+                             (path, FORMAT_VERSION))
+        self.fields = tuple(
+            self._mmap[offset:offset + FIELD_NAME_SIZE].rstrip(b'\0')
+            .decode('ascii')
+            for offset in range(HEADER.size,
+                                HEADER.size + field_count * FIELD_NAME_SIZE,
+                                FIELD_NAME_SIZE)
+        )
+        start = HEADER.size + field_count * FIELD_NAME_SIZE
+        size = ZIPCODE_COUNT * field_count * 4
+        if len(self._mmap) != start + size:
+            raise ValueError('%s is truncated' % path)
+        self._values = memoryview(self._mmap)[start:].cast('f')
+
+    def _row(self, zipcode):
+        if zipcode is None or not 0 <= zipcode < ZIPCODE_COUNT:
+            return None
+        width = len(self.fields)
+        row = self._values[zipcode * width:(zipcode + 1) * width]
+        if all(math.isnan(value) for value in row):
+            return None
+        return {field: None if math.isnan(value) else value
+                for field, value in zip(self.fields, row)}
+
+    def get(self, zipcode):
+        """Return the reference values of a zipcode, or None if unknown"""
+        return self._row(zipcode)
+
+    def get_many(self, zipcodes):
+        """Return the reference values of each zipcode, in order"""
+        return [self._row(zipcode) for zipcode in zipcodes]
+
+    def column(self, field, zipcodes):
+        """Return a single field for a batch of zipcodes.
+
+        This is the fast path for batch scoring: one strided read per
+        zipcode with no per-row dict.
+        """
+        width = len(self.fields)
+        index = self.fields.index(field)
+        values = []
+        for zipcode in zipcodes:
+            value = math.nan
+            if zipcode is not None and 0 <= zipcode < ZIPCODE_COUNT:
+                value = self._values[zipcode * width + index]
+            values.append(None if math.isnan(value) else value)
+        return values
+
+
+def write_table(path, fields, rows, version):
+    """Write a zipcode reference file.
+
+    rows maps zipcodes to sequences of values in the order of fields.
+    """
+    for field in fields:
+        if len(field.encode('ascii')) > FIELD_NAME_SIZE:
+            raise ValueError('Field name too long: %s' % field)
+    values = array.array('f', [math.nan]) * (ZIPCODE_COUNT * len(fields))
+    for zipcode, row in rows.items():
+        if not 0 <= zipcode < ZIPCODE_COUNT:
+            raise ValueError('Invalid zipcode: %s' % zipcode)
+        start = zipcode * len(fields)
+        values[start:start + len(fields)] = array.array('f', row)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(fields), version))
+        for field in fields:
+            f.write(field.encode('ascii').ljust(FIELD_NAME_SIZE, b'\0'))
+        values.tofile(f)
+
+
+def get_table():
+    """Return the process-wide zipcode table, or None if none is built.
+
+    The file is mapped again once it was replaced; a table that was mapped
+    keeps being served if the file goes away.
+    """
+    global _table, _checked_at
+    interval = getattr(settings, 'ZIPCODE_TABLE_CHECK_INTERVAL', 60)
+    now = time.monotonic()
+    if _table is not None and now - _checked_at < interval:
+        return _table
+    _checked_at = now
+    path = settings.ZIPCODE_TABLE_PATH
+    try:
+        identity = file_identity(path, os.stat(path))
+        if _table is None or _table.identity != identity:
+            _table = ZipcodeTable(path)
+    except FileNotFoundError:
+        pass
+    return _table
+
+
+def reset():
+    """Forget the mapped table so the next lookup maps the file again"""
+    global _table
+    _table = None
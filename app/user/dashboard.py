@@ -0,0 +1,122 @@
+"""Materialized home screen documents.
+
+A user's core.Dashboard row holds the sections of the home screen: the
+profile, both scores, the tags with their product counts and the most
+recently changed products, each as the matching API endpoint renders
+it.  user.signals refreshes the sections a write to a user, score,
+product, tag or product-tag link affects, and product.tagging does so
+for its own writes.  A refresh recomputes those sections only and merges
+them into the stored document in one upsert, inside the transaction of
+the write.  Refreshes of a user are serialized by an advisory lock held
+until that transaction ends and taken before any section is read, so a
+concurrent write reads the sections only once the other has committed
+and cannot merge in a copy missing its change.  Reading a dashboard is
+then one primary key lookup; sections missing from a document, as for
+users created in bulk, are built on read.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from core.models import Dashboard, Product, Tag
+
+from product.serializers import ProductSerializer, TagStatsSerializer
+
+from score import zipcodes
+from score.serializers import ScoreSerializer
+
+from user.serializers import UserSerializer
+
+
+RECENT_PRODUCTS = 10
+
+UPSERT_SQL = """
+INSERT INTO core_dashboard (user_id, document, updated_at)
+VALUES (%s, %s::jsonb, now())
+ON CONFLICT (user_id) DO UPDATE SET
+    document = core_dashboard.document || EXCLUDED.document,
+    updated_at = EXCLUDED.updated_at
+RETURNING document
+"""
+
+
+def profile(user):
+    data = UserSerializer(user).data
+    for field in ('scores_initial', 'scores_final', 'region'):
+        data.pop(field, None)
+    return data
+
+
+def scores(user):
+    return {
+        name: ScoreSerializer(score).data if score is not None else None
+        for name, score in (('initial', user.scores_initial),
+                            ('final', user.scores_final))
+    }
+
+
+def tags(user_id):
+    queryset = Tag.objects.filter(user_id=user_id) \
+        .order_by('-product_count', 'name')
+    return TagStatsSerializer(queryset, many=True).data
+
+
+def products(user_id):
+    queryset = Product.objects.filter(user_id=user_id) \
+        .prefetch_tags(user_id).order_by('-updated_at', '-id')
+    return ProductSerializer(queryset[:RECENT_PRODUCTS], many=True).data
+
+
+SECTIONS = {
+    'profile': profile,
+    'scores': scores,
+    'tags': tags,
+    'products': products,
+}
+# Sections built from the user rather than its id
+USER_SECTIONS = {'profile', 'scores'}
+
+
+def refresh(user, *sections):
+    """Recompute sections of a user's dashboard and return the document.
+
+    user may be a user or its id.
+    """
+    if isinstance(user, get_user_model()):
+        user_id = user.pk
+    else:
+        user_id, user = user, None
+        if USER_SECTIONS.intersection(sections):
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is None:
+                return None
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                       ['user.dashboard:%s' % user_id])
+        data = {
+            section: SECTIONS[section](
+                user if section in USER_SECTIONS else user_id
+            ) for section in sections
+        }
+        cursor.execute(UPSERT_SQL, [
+            user_id, json.dumps(data, cls=DjangoJSONEncoder)
+        ])
+        document = cursor.fetchone()[0]
+    return json.loads(document) if isinstance(document, str) else document
+
+
+def get(user):
+    """Return the dashboard of a user"""
+    document = Dashboard.objects.filter(user_id=user.pk) \
+        .values_list('document', flat=True).first() or {}
+    missing = [section for section in SECTIONS if section not in document]
+    if missing:
+        document = refresh(user, *missing)
+    # Reference data changes independently of the user, so the region is
+    # looked up in the mapped zipcode table on every read
+    table = zipcodes.get_table()
+    document['profile']['region'] = table.get(user.zipcode) \
+        if table else None
+    return document
@@ -0,0 +1,129 @@
+"""Account deletion in the background.
+
+Deleting a user in one cascade locks all of its rows for as long as the
+cascade takes.  Instead request_deletion() deactivates the account and
+revokes its tokens at once, then purge_account() runs as a core.jobs task
+deleting the dependent rows in small batches, children before parents.
+Each batch commits together with the progress in core.AccountDeletion, so
+an interrupted purge leaves no orphans and resumes where it stopped.  A
+run stops after a time budget and queues its own continuation.
+"""
+import logging
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from core.models import AccountDeletion
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+TIME_BUDGET = 5
+
+# Tables purged in order, with the condition selecting a user's rows and
+# the column returned for each deleted row
+STEPS = (
+    ('core_scorehistory', 'user_id = %s', 'score_id'),
+    ('core_product_tags',
+     'product_id IN (SELECT id FROM core_product WHERE user_id = %s)', 'id'),
+    ('core_product', 'user_id = %s', 'id'),
+    ('core_tag', 'user_id = %s', 'id'),
+    # Deleting products and tags writes tombstones, so these go last
+    ('core_tombstone', 'user_id = %s', 'id'),
+)
+
+DELETE_SCORES_SQL = """
+DELETE FROM core_score s WHERE s.id = ANY(%s)
+    AND NOT EXISTS (SELECT 1 FROM core_scorehistory h
+                    WHERE h.score_id = s.id)
+    AND NOT EXISTS (SELECT 1 FROM core_user u
+                    WHERE u.scores_initial_id = s.id
+                    OR u.scores_final_id = s.id)
+"""
+
+
+def request_deletion(user):
+    """Deactivate an account and queue the purge of its data"""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active', 'updated_at'])
+        Token.objects.filter(user=user).delete()
+        deletion = AccountDeletion.objects.create(user=user)
+        jobs.enqueue(purge_account, deletion_id=deletion.pk)
+    return deletion
+
+
+def _delete_scores(cursor, score_ids):
+    """Delete the given scores unless something still refers to them"""
+    if not score_ids:
+        return 0
+    cursor.execute(DELETE_SCORES_SQL, [list(score_ids)])
+    return cursor.rowcount
+
+
+def purge_batch(user_id, batch_size=BATCH_SIZE):
+    """Delete one batch of a user's rows and return the counts by table.
+
+    Returns an empty dict once only the user row itself is left.
+    """
+    with connection.cursor() as cursor:
+        for table, condition, returning in STEPS:
+            cursor.execute(
+                'DELETE FROM {table} WHERE {condition} AND id IN ('
+                'SELECT id FROM {table} WHERE {condition} LIMIT %s'
+                ') RETURNING {returning}'.format(
+                    table=table, condition=condition, returning=returning
+                ), [user_id, user_id, batch_size]
+            )
+            values = [row[0] for row in cursor.fetchall()]
+            if not values:
+                continue
+            counts = {table: len(values)}
+            if returning == 'score_id':
+                counts['core_score'] = _delete_scores(cursor, set(values))
+            return counts
+    return {}
+
+
+def delete_user(user_id):
+    """Delete a purged user, its scores and its remaining small relations"""
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None:
+        return {}
+    score_ids = {user.scores_initial_id, user.scores_final_id} - {None}
+    _, deleted = user.delete()
+    counts = {'core_user': deleted.get(user._meta.label, 0)}
+    with connection.cursor() as cursor:
+        counts['core_score'] = _delete_scores(cursor, score_ids)
+    return counts
+
+
+def purge_account(deletion_id, batch_size=BATCH_SIZE,
+                  time_budget=TIME_BUDGET):
+    """Purge batches of a deactivated account until done or out of time"""
+    deadline = time.monotonic() + time_budget
+    while time.monotonic() < deadline:
+        with transaction.atomic():
+            deletion = AccountDeletion.objects.select_for_update() \
+                .get(pk=deletion_id)
+            if deletion.finished_at:
+                return
+            counts = purge_batch(deletion.user_id, batch_size)
+            if not counts:
+                counts = delete_user(deletion.user_id)
+                deletion.finished_at = timezone.now()
+            deletion.batches += 1
+            for table, count in counts.items():
+                deletion.deleted[table] = deletion.deleted.get(table, 0) + \
+                    count
+            deletion.save()
+        logger.info('Account deletion %s', deletion)
+        if deletion.finished_at:
+            return
+    jobs.enqueue(purge_account, deletion_id=deletion_id)
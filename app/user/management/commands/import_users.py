@@ -0,0 +1,158 @@
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from rest_framework.authtoken.models import Token
+
+
+User = get_user_model()
+
+FIELDS = ('name', 'first_name', 'last_name', 'email', 'age', 'zipcode',
+          'income', 'education', 'employment')
+SEPARATORS = re.compile(r'[\s().-]')
+
+
+def hash_password(password):
+    """Hash a password, in a worker process"""
+    return make_password(password)
+
+
+def clean_row(record):
+    """Return an unsaved user for a CSV record, or raise ValidationError"""
+    phone_number = SEPARATORS.sub('', record.get('phone_number') or '')
+    User.phone_regex(phone_number)
+    user = User(phone_number=phone_number, **{
+        field: (record[field] or '').strip() or None
+        for field in FIELDS if field in record
+    })
+    if user.name is None:
+        user.name = ''
+    user.clean_fields(exclude=['password'])
+    return user
+
+
+def describe(error):
+    """Return the messages of a ValidationError on one line"""
+    if hasattr(error, 'error_dict'):
+        return '; '.join('%s: %s' % (field, ' '.join(messages))
+                         for field, messages in error.message_dict.items())
+    return '; '.join(error.messages)
+
+
+class Command(BaseCommand):
+    """Django command to create users in bulk from a CSV.
+
+    The CSV needs a phone_number column and may have password and any of
+    the profile fields.  Rows without a password get an unusable one.
+    Passwords are hashed in a pool of processes, users and their tokens are
+    inserted in batches, and rows which are invalid or whose phone number
+    is taken are reported rather than imported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Password hashing processes')
+        parser.add_argument('--no-tokens', action='store_true',
+                            help='Do not create auth tokens')
+        parser.add_argument('--conflicts',
+                            help='Write rows which were not imported to '
+                                 'this CSV file')
+
+    def handle(self, *args, **options):
+        self.rejected = []
+        self.workers = options['workers']
+        rows = self.read(options['csv_path'])
+        created = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            size = options['batch_size']
+            for start in range(0, len(rows), size):
+                created += self.import_batch(
+                    pool, rows[start:start + size], not options['no_tokens']
+                )
+
+        for line, phone_number, reason in self.rejected:
+            self.stdout.write('Line %d: %s %s' % (line, phone_number, reason))
+        if options['conflicts']:
+            with open(options['conflicts'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(('line', 'phone_number', 'reason'))
+                writer.writerows(self.rejected)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d users, rejected %d rows' % (
+                created, len(self.rejected)
+            )
+        ))
+
+    def read(self, path):
+        """Return (line, user, password) of the valid rows of a CSV"""
+        rows = []
+        seen = set()
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            if 'phone_number' not in (reader.fieldnames or ()):
+                raise CommandError('CSV has no phone_number column')
+            for line, record in enumerate(reader, start=2):
+                try:
+                    user = clean_row(record)
+                except ValidationError as exc:
+                    self.reject(line, record.get('phone_number'),
+                                describe(exc))
+                    continue
+                if user.phone_number in seen:
+                    self.reject(line, user.phone_number,
+                                'duplicate in file')
+                    continue
+                seen.add(user.phone_number)
+                rows.append((line, user, record.get('password') or None))
+        return rows
+
+    def reject(self, line, phone_number, reason):
+        self.rejected.append((line, phone_number, reason))
+
+    def drop_existing(self, rows):
+        """Report and remove rows whose phone number is registered"""
+        existing = set(User.objects.filter(
+            phone_number__in=[user.phone_number for _, user, _ in rows]
+        ).values_list('phone_number', flat=True))
+        for line, user, _ in rows:
+            if user.phone_number in existing:
+                self.reject(line, user.phone_number, 'already exists')
+        return [row for row in rows if row[1].phone_number not in existing]
+
+    def import_batch(self, pool, rows, tokens):
+        """Hash the passwords of a batch and insert it, return users added"""
+        rows = self.drop_existing(rows)
+        passwords = [password for _, _, password in rows]
+        hashed = pool.map(hash_password, passwords,
+                          chunksize=max(1, len(rows) // (self.workers * 4)))
+        for (_, user, _), password in zip(rows, hashed):
+            user.password = password
+
+        while rows:
+            users = [user for _, user, _ in rows]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(users)
+                    if tokens:
+                        Token.objects.bulk_create([
+                            Token(user=user, key=Token().generate_key())
+                            for user in users
+                        ])
+            except IntegrityError:
+                # Someone registered one of the numbers meanwhile
+                remaining = self.drop_existing(rows)
+                if len(remaining) == len(rows):
+                    raise
+                rows = remaining
+                continue
+            return len(users)
+        return 0
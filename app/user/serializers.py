@@ -1,35 +1,69 @@
 from django.contrib.auth import get_user_model, authenticate
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from core.sparse_fields import SparseFieldsSerializerMixin
+
+from score import history, zipcodes
 from score.serializers import ScoreSerializer
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsSerializerMixin,
+                     serializers.ModelSerializer):
     """Serializer for the user object"""
     scores_initial = ScoreSerializer(many=False)
     scores_final = ScoreSerializer(many=False)
+    region = serializers.SerializerMethodField()
 
     class Meta:
         model = get_user_model()
         fields = ('phone_number', 'password', 'name', 'scores_initial',
                   'scores_final', 'first_name', 'last_name', 'age',
-                  'zipcode', 'income', 'education', 'employment')
+                  'zipcode', 'region', 'income', 'education', 'employment')
         extra_kwargs = {'password': {'write_only': True, 'min_length': 5}}
 
+    def get_region(self, obj):
+        """Return the zipcode reference data for the user's zipcode"""
+        table = zipcodes.get_table()
+        return table.get(obj.zipcode) if table else None
+
+    def save_scores(self, user, scores):
+        """Store submitted scores, appending them to the score history"""
+        if 'scores_initial' in scores:
+            history.record_initial_score(
+                user, ScoreSerializer().create(scores['scores_initial'])
+            )
+        if 'scores_final' in scores:
+            history.record_score(
+                user, ScoreSerializer().create(scores['scores_final'])
+            )
+
+    def pop_scores(self, validated_data):
+        return {name: validated_data.pop(name)
+                for name in ('scores_initial', 'scores_final')
+                if name in validated_data}
+
+    @transaction.atomic
     def create(self, validated_data):
         """Create a new user with encrypted password and return it"""
-        return get_user_model().objects.create_user(**validated_data)
+        scores = self.pop_scores(validated_data)
+        user = get_user_model().objects.create_user(**validated_data)
+        self.save_scores(user, scores)
+        return user
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a user, setting the password correctly and return it"""
+        scores = self.pop_scores(validated_data)
         password = validated_data.pop('password', None)
         user = super().update(instance, validated_data)
 
         if password:
             user.set_password(password)
             user.save()
+        self.save_scores(user, scores)
 
         return user
 
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Dashboard, Product, Score, Tag
+
+from user import dashboard
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def refresh_profile(sender, instance, update_fields=None, **kwargs):
+    """Refresh the profile and scores on a user's dashboard"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    dashboard.refresh(instance, 'profile', 'scores')
+
+
+@receiver(post_delete, sender=User)
+def delete_dashboard(sender, instance, **kwargs):
+    """Delete the dashboard of a deleted user"""
+    Dashboard.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Score)
+def refresh_scores(sender, instance, created, **kwargs):
+    """Refresh the scores on the dashboards of users of an edited score"""
+    if created:
+        return
+    users = User.objects.filter(
+        Q(scores_initial=instance.pk) | Q(scores_final=instance.pk)
+    )
+    for user in users:
+        dashboard.refresh(user, 'scores')
+
+
+@receiver(post_save, sender=Product)
+def refresh_products(sender, instance, **kwargs):
+    """Refresh the recent products on the owner's dashboard"""
+    dashboard.refresh(instance.user_id, 'products')
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tags(sender, instance, **kwargs):
+    """Refresh the tags on the owner's dashboard"""
+    dashboard.refresh(instance.user_id, 'tags')
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Tag)
+def refresh_after_delete(sender, instance, **kwargs):
+    """Refresh tags and products after a product or tag is deleted"""
+    dashboard.refresh(instance.user_id, 'tags', 'products')
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def refresh_after_links(sender, instance, action, **kwargs):
+    """Refresh tags and products when product tags change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        dashboard.refresh(instance.user_id, 'tags', 'products')
@@ -0,0 +1,153 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Dashboard, Product, Score, Tag
+
+
+DASHBOARD_URL = reverse('user:dashboard')
+
+
+class DashboardApiTests(TestCase):
+    """Test the materialized dashboard"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            '4086432477', 'testpass', name='Test name'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_requires_authentication(self):
+        """Test that authentication is required for the dashboard"""
+        res = APIClient().get(DASHBOARD_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_dashboard_is_one_lookup(self):
+        """Test a dashboard kept up by writes is read in one query"""
+        self.user.scores_final = Score.objects.create(score_overall=40)
+        self.user.save()
+        tag = Tag.objects.create(user=self.user, name='Insurance')
+        Product.objects.create(user=self.user, title='Bike', price=5)
+        car = Product.objects.create(user=self.user, title='Car', price=10)
+        car.tags.add(tag)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(DASHBOARD_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['profile']['name'], 'Test name')
+        self.assertIsNone(res.data['profile']['region'])
+        self.assertNotIn('password', res.data['profile'])
+        self.assertIsNone(res.data['scores']['initial'])
+        self.assertEqual(res.data['scores']['final']['score_overall'], 40)
+        self.assertEqual(res.data['tags'], [
+            {'id': tag.id, 'name': 'Insurance', 'product_count': 1}
+        ])
+        self.assertEqual([p['title'] for p in res.data['products']],
+                         ['Car', 'Bike'])
+        self.assertEqual(res.data['products'][0]['tags'], [tag.id])
+
+    def test_dashboard_follows_writes(self):
+        """Test score, product and tag changes reach the document"""
+        score = Score.objects.create(score_overall=40)
+        self.user.scores_final = score
+        self.user.save()
+        tag = Tag.objects.create(user=self.user, name='Insurance')
+        car = Product.objects.create(user=self.user, title='Car', price=10)
+        car.tags.add(tag)
+
+        score.score_overall = 60
+        score.save()
+        tag.name = 'Cover'
+        tag.save(update_fields=['name'])
+        car.tags.remove(tag)
+        bike = Product.objects.create(user=self.user, title='Bike', price=5)
+        car.delete()
+
+        document = self.client.get(DASHBOARD_URL).data
+        self.assertEqual(document['scores']['final']['score_overall'], 60)
+        self.assertEqual(document['tags'], [
+            {'id': tag.id, 'name': 'Cover', 'product_count': 0}
+        ])
+        self.assertEqual([p['id'] for p in document['products']], [bike.id])
+
+    def test_missing_dashboard_built_on_read(self):
+        """Test a user without a stored document gets one built"""
+        Dashboard.objects.all().delete()
+        Product.objects.bulk_create([
+            Product(user=self.user, title='Car', price=10)
+        ])
+
+        res = self.client.get(DASHBOARD_URL)
+
+        self.assertEqual(res.data['profile']['phone_number'], '4086432477')
+        self.assertEqual(len(res.data['products']), 1)
+        self.assertTrue(Dashboard.objects.filter(user=self.user).exists())
+
+    def test_deleted_user_dashboard_removed(self):
+        """Test deleting a user with products leaves no dashboard"""
+        Product.objects.create(user=self.user, title='Car', price=10)
+
+        self.user.delete()
+
+        self.assertFalse(Dashboard.objects.exists())
+
+
+class DashboardConcurrencyTests(TransactionTestCase):
+    """Test refreshes of one user from concurrent transactions"""
+    # Listing the apps lets the flush after each test truncate with
+    # CASCADE, as partitioned tables are left out of its table list
+    available_apps = [
+        'django.contrib.auth', 'django.contrib.contenttypes',
+        'rest_framework.authtoken', 'core', 'user', 'score', 'product',
+    ]
+
+    def wait_for_lock_wait(self):
+        """Wait until another connection is blocked on a lock"""
+        deadline = time.monotonic() + 5
+        with connection.cursor() as cursor:
+            while time.monotonic() < deadline:
+                cursor.execute('SELECT pg_stat_clear_snapshot()')
+                cursor.execute(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE wait_event_type = 'Lock' "
+                    "AND pid <> pg_backend_pid()"
+                )
+                if cursor.fetchone()[0]:
+                    return
+                time.sleep(0.01)
+        self.fail('No connection waited on a lock')
+
+    def test_concurrent_writes_both_reach_dashboard(self):
+        """Test a write waiting on another's refresh sees its product"""
+        user = get_user_model().objects.create_user('4086432477', 'pw')
+        errors = []
+
+        def write():
+            try:
+                Product.objects.create(user=user, title='Bike', price=5)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write)
+        with transaction.atomic():
+            Product.objects.create(user=user, title='Car', price=10)
+            thread.start()
+            self.wait_for_lock_wait()
+        thread.join()
+
+        self.assertEqual(errors, [])
+        document = Dashboard.objects.get(user=user).document
+        self.assertEqual([p['title'] for p in document['products']],
+                         ['Bike', 'Car'])
@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import AccountDeletion, Job, Product, Score, \
+    ScoreHistory, Tag, Tombstone
+
+from score.history import record_score
+
+from user import deletion
+
+
+ME_URL = reverse('user:me')
+
+
+def sample_score(overall=50):
+    """Create and return a sample score"""
+    return Score.objects.create(
+        version='0.0', score_overall=overall, score_medical=10,
+        score_income=20, score_stuff=30, score_liability=40,
+        score_digital=50
+    )
+
+
+def sample_account(phone_number):
+    """Create a user with scores, tags and tagged products"""
+    user = get_user_model().objects.create_user(phone_number, 'testpass')
+    record_score(user, sample_score(10))
+    record_score(user, sample_score(20))
+    record_score(user, sample_score(30))
+    tags = [Tag.objects.create(user=user, name='tag %d' % i)
+            for i in range(3)]
+    for i in range(5):
+        product = Product.objects.create(user=user, title=str(i), price=1)
+        product.tags.set(tags)
+    return user
+
+
+class AccountDeletionApiTests(TestCase):
+    """Test deleting the authenticated account"""
+
+    def test_delete_deactivates_and_queues_purge(self):
+        """Test that deleting the profile disables it and queues a job"""
+        user = sample_account('4086432477')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        res = client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertFalse(Token.objects.filter(user=user).exists())
+        record = AccountDeletion.objects.get(user_id=user.pk)
+        self.assertIsNone(record.finished_at)
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'user.deletion.purge_account')
+        self.assertEqual(job.payload, {'deletion_id': record.pk})
+        self.assertEqual(Product.objects.filter(user=user).count(), 5)
+        res = client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PurgeAccountTests(TestCase):
+    """Test purging deactivated accounts in batches"""
+
+    def setUp(self):
+        self.user = sample_account('4086432477')
+        self.other = sample_account('4086432478')
+        self.deletion = deletion.request_deletion(self.user)
+        Job.objects.all().delete()
+
+    def test_purge_removes_all_rows(self):
+        """Test that a purge deletes the account and everything it owns"""
+        user_id = self.user.pk
+
+        deletion.purge_account(self.deletion.pk, batch_size=2)
+
+        self.deletion.refresh_from_db()
+        self.assertIsNotNone(self.deletion.finished_at)
+        self.assertFalse(get_user_model().objects.filter(pk=user_id).exists())
+        for model in (Product, Tag, Tombstone, ScoreHistory):
+            self.assertFalse(model.objects.filter(user_id=user_id).exists())
+        self.assertEqual(Score.objects.count(), 3)
+        self.assertEqual(self.deletion.deleted, {
+            'core_scorehistory': 3, 'core_score': 3, 'core_product_tags': 15,
+            'core_product': 5, 'core_tag': 3, 'core_tombstone': 8,
+            'core_user': 1
+        })
+        self.assertFalse(Job.objects.exists())
+
+    def test_purge_leaves_other_accounts(self):
+        """Test that other users' rows are kept"""
+        deletion.purge_account(self.deletion.pk)
+
+        self.assertEqual(Product.objects.filter(user=self.other).count(), 5)
+        self.assertEqual(self.other.product_set.first().tags.count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.other).count(), 3)
+        self.assertEqual(
+            ScoreHistory.objects.filter(user=self.other).count(), 3
+        )
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.scores_final.score_overall, 30)
+
+    def test_purge_continues_after_time_budget(self):
+        """Test that a purge out of time commits and queues the rest"""
+        with patch('user.deletion.time') as clock:
+            clock.monotonic.side_effect = [0, 0, 10]
+            deletion.purge_account(self.deletion.pk, batch_size=2)
+
+        self.deletion.refresh_from_db()
+        self.assertEqual(self.deletion.batches, 1)
+        self.assertIsNone(self.deletion.finished_at)
+        self.assertEqual(ScoreHistory.objects.filter(user=self.user).count(),
+                         1)
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'deletion_id': self.deletion.pk})
+
+        deletion.purge_account(**job.payload)
+
+        self.deletion.refresh_from_db()
+        self.assertIsNotNone(self.deletion.finished_at)
@@ -0,0 +1,70 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+
+
+ROWS = [
+    ('phone_number', 'password', 'name', 'age', 'education'),
+    ('(408) 643-2477', 'secret1', 'Ann', '30', 'College'),
+    ('408.643.2478', '', 'Bob', '', ''),
+    ('12', 'secret3', 'Short', '', ''),
+    ('4086432477', 'secret4', 'Again', '', ''),
+    ('4086432479', 'secret5', 'Taken', '', ''),
+    ('4086432480', 'secret6', 'Bad', '30', 'Kindergarten'),
+]
+
+
+class ImportUsersCommandTests(TestCase):
+    """Test importing users from a CSV"""
+
+    def setUp(self):
+        get_user_model().objects.create_user('4086432479', 'testpass')
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', newline='') as f:
+            csv.writer(f).writerows(ROWS)
+        self.conflicts = self.path + '.conflicts'
+
+    def tearDown(self):
+        for path in (self.path, self.conflicts):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_import_users(self):
+        """Test valid rows are imported and the others reported"""
+        out = StringIO()
+
+        call_command('import_users', self.path, '--workers', '2',
+                     '--batch-size', '2', '--conflicts', self.conflicts,
+                     stdout=out)
+
+        user = get_user_model().objects.get(phone_number='4086432477')
+        self.assertTrue(user.check_password('secret1'))
+        self.assertEqual((user.name, user.age, user.education),
+                         ('Ann', 30, 'College'))
+        other = get_user_model().objects.get(phone_number='4086432478')
+        self.assertFalse(other.has_usable_password())
+        self.assertEqual(Token.objects.filter(user__in=[user, other]).count(),
+                         2)
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertIn('Imported 2 users, rejected 4 rows', out.getvalue())
+        with open(self.conflicts, newline='') as f:
+            rejected = {int(row['line']): row['reason']
+                        for row in csv.DictReader(f)}
+        self.assertEqual(sorted(rejected), [4, 5, 6, 7])
+        self.assertEqual(rejected[5], 'duplicate in file')
+        self.assertEqual(rejected[6], 'already exists')
+        self.assertIn('education', rejected[7])
+
+    def test_import_users_without_tokens(self):
+        """Test tokens can be skipped"""
+        call_command('import_users', self.path, '--workers', '1',
+                     '--no-tokens', stdout=StringIO())
+
+        self.assertFalse(Token.objects.exists())
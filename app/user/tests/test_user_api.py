@@ -1,10 +1,15 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+import msgpack
+
+from core.models import Score
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -20,6 +25,7 @@ class PublicUserApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
     def test_create_valid_user_success(self):
         """Test creating user with valid payload is successful"""
@@ -57,6 +63,19 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_user_retry_replayed(self):
+        """Test a retried signup with an Idempotency-Key is replayed"""
+        payload = {'phone_number': '4086432477', 'password': 'tp'}
+        res1 = self.client.post(CREATE_USER_URL, payload,
+                                HTTP_IDEMPOTENCY_KEY='signup-1')
+        res2 = self.client.post(CREATE_USER_URL, payload,
+                                HTTP_IDEMPOTENCY_KEY='signup-1')
+
+        self.assertEqual(res1.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res2.content, res1.content)
+        self.assertEqual(res2['Idempotent-Replayed'], 'true')
+
     def test_password_too_short(self):
         """Test that the password must be more than 5 charachters"""
         payload = {
@@ -107,6 +126,23 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {
+        'login': '2/min', 'login_ip': '100/min', 'signup': '100/min',
+        'product_write': '100/min'}})
+    def test_create_token_throttled_per_phone_number(self):
+        """Test that repeated logins for one phone number are throttled"""
+        create_user(phone_number='4086432477', password='testpass')
+        payload = {'phone_number': '4086432477', 'password': 'wrong'}
+        for _ in range(2):
+            self.client.post(TOKEN_URL, payload)
+
+        res = self.client.post(TOKEN_URL, payload)
+        other = self.client.post(TOKEN_URL, {'phone_number': '4086432478',
+                                             'password': 'wrong'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_user_unauthorized(self):
         """"Test that authentication is required for users"""
         res = self.client.get(ME_URL)
@@ -150,3 +186,53 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_profile_msgpack(self):
+        """Test the profile can be negotiated as MessagePack"""
+        res = self.client.get(ME_URL, HTTP_ACCEPT='application/msgpack')
+
+        data = msgpack.unpackb(res.content, raw=False)
+        self.assertEqual(data['phone_number'], self.user.phone_number)
+
+    def test_update_profile_msgpack(self):
+        """Test updating the profile from a MessagePack body"""
+        res = self.client.patch(ME_URL, msgpack.packb({'name': 'packed'}),
+                                content_type='application/msgpack')
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.name, 'packed')
+
+    def test_retrieve_profile_sparse_fields(self):
+        """Test ?fields= limits the profile and skips score queries"""
+        self.user.scores_final = Score.objects.create(score_overall=10)
+        self.user.save()
+
+        # Only the score timestamp query for the ETag
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL, {'fields': 'name,phone_number'})
+
+        self.assertEqual(res.data, {'name': 'name',
+                                    'phone_number': self.user.phone_number})
+
+    def test_retrieve_profile_scores_joined(self):
+        """Test requested scores are fetched with the user in one query"""
+        self.user.scores_initial = Score.objects.create(score_overall=10)
+        self.user.scores_final = Score.objects.create(score_overall=20)
+        self.user.save()
+
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL, {'fields': 'scores_final'})
+
+        self.assertEqual(res.data['scores_final']['score_overall'], 20)
+
+    def test_profile_not_modified(self):
+        """Test an unchanged profile answers 304 to its ETag"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(ME_URL, {'name': 'new name'})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,27 +1,96 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.conditional import ConditionalGetMixin
+from core.idempotency import IdempotentCreateMixin
+from core.models import Score
+from core.renderers import MessagePackRenderer, MessagePackParser
+from core.sparse_fields import SparseFieldsViewMixin
+from core.throttling import PhoneNumberThrottle, LoginIPThrottle, \
+                           SignupIPThrottle
+
+from score import zipcodes
 
+from user import dashboard, deletion
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(IdempotentCreateMixin, generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    throttle_classes = (SignupIPThrottle,)
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPThrottle, PhoneNumberThrottle)
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class DashboardView(APIView):
+    """Home screen data of the authenticated user in one document"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + \
+        [MessagePackRenderer]
+
+    def get(self, request):
+        """Return the profile, scores, tags and recent products"""
+        return Response(dashboard.get(request.user))
+
+
+class ManageUserView(ConditionalGetMixin, SparseFieldsViewMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + \
+        [MessagePackRenderer]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + \
+        [MessagePackParser]
+
+    def retrieve(self, request, *args, **kwargs):
+        """Show the profile, or answer 304 if it did not change"""
+        user = request.user
+        timestamps = [user.updated_at]
+        score_ids = [score_id for score_id in (user.scores_initial_id,
+                                               user.scores_final_id)
+                     if score_id is not None]
+        if score_ids:
+            timestamps.append(Score.objects.filter(pk__in=score_ids)
+                              .aggregate(updated=Max('updated_at'))['updated'])
+        table = zipcodes.get_table()
+        version = (timestamps, score_ids, table and table.version)
+        return self.conditional(
+            version, lambda: super(ManageUserView, self).retrieve(
+                request, *args, **kwargs
+            ), last_modified=max(filter(None, timestamps))
+        )
 
     def get_object(self):
-        """Retrieve and return authentication user"""
-        return self.request.user
+        """Retrieve and return authentication user.
+
+        The user is already loaded by authentication; it is only fetched
+        again, joined with its scores, when set scores are requested.
+        """
+        user = self.request.user
+        scores = [name for name in ('scores_initial', 'scores_final')
+                  if self.wants_field(name) and
+                  getattr(user, '%s_id' % name) is not None]
+        if not scores:
+            return user
+        return get_user_model().objects.select_related(*scores) \
+            .get(pk=user.pk)
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the account and delete its data in the background"""
+        deletion.request_deletion(request.user)
+        return Response(status=status.HTTP_202_ACCEPTED)